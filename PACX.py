@@ -3,36 +3,59 @@ PACX Personal Accounting Software
 
 Author: Boren Xue
 '''
+import time
+#start of the imports (--profile-startup)
+IMPORT_START = time.perf_counter()
 import os
+import sys
 import math
-import time
+import bisect
 import datetime as dt
 import calendar as cal
-import locale
 
 import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter import messagebox
+from tkinter import filedialog
 
-import matplotlib
-matplotlib.use('TkAgg')
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.figure import Figure
-
+#matplotlib is imported when the graphs are first shown (import_matplotlib)
+#numpy is imported anyway by transaction/analytics
 import numpy as np
 
 import transaction
+import analytics
+import formatting
+import storage
+import worker
+import ledgers
+import search
+IMPORT_END = time.perf_counter()
+
+def import_matplotlib():
+    #returns Figure, FigureCanvasTkAgg, NavigationToolbar2Tk
+    import matplotlib
+    matplotlib.use('TkAgg')
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    from matplotlib.figure import Figure
+    return Figure, FigureCanvasTkAgg, NavigationToolbar2Tk
 
 class App(tk.Tk):
 
     '''SETTING UP TEMPLATE -----------------------------------------------------------------------------'''
-    def __init__(self, filename=None, size='1400x690',):
+    def __init__(self, filename=None, size='1400x690', profile_startup=False, filenames=None):
+        #[(step, time)] of the startup when profile_startup is on, else None
+        self.startup_times = [('imports', IMPORT_START), ('imports done', IMPORT_END)] if profile_startup else None
         tk.Tk.__init__(self)
-        self.filename = filename
+        self.startup_mark('tk')
+        #several files (ledgers) can be open at once, self.filename is the first one
+        if filenames == None:
+            filenames = [] if filename == None else [filename]
+        self.filenames = list(filenames)
+        self.filename = self.filenames[0] if len(self.filenames) > 0 else None
         #geometry
         self.size = size
         #locale settings
-        locale.setlocale(locale.LC_ALL, 'english-nz')
+        formatting.set_locale('english-nz')
         #font
         #buttons/app text
         self.font1 = ('calibri', '12')
@@ -43,26 +66,10 @@ class App(tk.Tk):
         #info_box_text
         self.font4 = ('calibri', '11')
 
-        #default period 0-3 (day/week/month/quarter)
-        self.default_period = 1
-        self.period = self.default_period
-        #default period 2 (analysis) 1-4 (week/month/quarter/year)
-        self.default_period2 = 1
-        self.period2 = self.default_period2
-        #saved or not
-        self.changed = False
-
-        #these variables must exist at all times
-        self.transactions = []
-        self.analysis = []
+        self.init_variables()
         
-        #loading file (if any), self.transactions is always sorted according to date
-        if self.filename == None:
-            self.title('PACX - "New"')
-            self.transactions = []
-        else:
-            self.title('PACX - "' + self.filename + '"')
-            self.load_file(self.filename)
+        #self.transactions is always sorted according to date
+        self.set_title()
         
         #window size
         self.geometry(self.size)
@@ -71,8 +78,69 @@ class App(tk.Tk):
 
         self.create_shortcut_keys()
 
+        #loading files (if any)
+        if len(self.filenames) > 0:
+            self.start_loading(self.filenames)
+
         self.after(0, self.after_func)
         
+    def init_variables(self):
+        #state that does not depend on the widgets
+        #default period 0-3 (day/week/month/quarter)
+        self.default_period = 1
+        self.period = self.default_period
+        #default period 2 (analysis) 1-6 (week/month/quarter/year/fortnight/fiscal year, analytics.PERIODS)
+        self.default_period2 = 1
+        self.period2 = self.default_period2
+        #saved or not
+        self.changed = False
+        #transactions shown at a time in days
+        self.day_window = 500
+        #most bars in the visible part of the bar graph, longer histories are shown as averages of several periods
+        self.graph_max_bars = 150
+        #{period item: period key} of the period items not filled in yet, index of the first transaction shown in days
+        self.lazy_periods = {}
+        self.day_start = 0
+        #period items on screen: sorted period keys and {period key: period item}
+        self.period_item_keys = []
+        self.period_items = {}
+        #filter of the journal view (search.Query, None shows everything) and its text, index of self.transactions
+        #while filtered, the rows matching the filter and the position in them of the first row shown
+        self.filter_query = None
+        self.filter_text = ''
+        self.search_index = None
+        self.results = np.zeros(0, dtype=np.int64)
+        self.results_start = 0
+        #descriptions shown per period in the Descriptions tab
+        self.top_names = 5
+        #version of self.transactions, increased by every change (transactions_changed), and what has been worked out
+        #from that version: ('analysis', period2): (PeriodTotals, self.analysis), ('view', period): period starts,
+        #('names', period2, by category): analytics.NameTotals of the Descriptions/Trends tabs
+        self.version = 0
+        self.analysis_cache = analytics.AnalysisCache()
+        #analytics.DailyTotals of self.transactions, every analysis period is summed from it (None until needed)
+        self.daily_totals = None
+
+        #these variables must exist at all times
+        self.transactions = transaction.TransactionStore()
+        self.analysis = []
+        #running totals behind self.analysis (None until there is an analysis)
+        self.period_totals = None
+        #all the transactions of the open files, the ledger (file index) of each row is in the store
+        #self.transactions is the same store, or only the rows of self.ledger when one ledger is selected
+        self.all_transactions = self.transactions
+        self.ledger = None
+        #storage of each open file, records the changes until they are saved (empty for a new file)
+        self.backends = []
+        #loading and grouping run in the worker thread, the window is shown meanwhile
+        self.worker = worker.Worker()
+        self.loading = False
+        #{channel: [text, start time]} of the running jobs, the newest is shown in info_text, whether poll_worker is scheduled
+        self.job_texts = {}
+        self.polling = False
+        #info text once the analysis in the worker is done (start_analysis)
+        self.analysis_done_text = ''
+
     def init_window(self):
         #main frame
         self.main_frame = tk.Frame(self, borderwidth=4, relief='sunken')
@@ -113,6 +181,7 @@ class App(tk.Tk):
         self.init_top_right_frame(self.top_right_frame)
         self.init_bot_right_frame(self.bot_right_frame)
         self.init_info_box(self.info_box_frame)
+        self.startup_mark('widgets')
 
         #so it always exist
         self.LR_pane_width = 0
@@ -121,8 +190,10 @@ class App(tk.Tk):
         self.create_events()
 
         self.show_file_contents()
+        self.startup_mark('show transactions')
 
         self.init_analysis()
+        self.startup_mark('analysis')
         
     def create_menu(self):
         #menu bar
@@ -178,6 +249,14 @@ class App(tk.Tk):
         yscrollbar = ttk.Scrollbar(parent, orient='vertical', command=self.treeview.yview)
         self.treeview.config(yscrollcommand=yscrollbar.set)
 
+        #filter box, eg. 'groc type:1 amount:-50..0 date:2017' (see search.parse)
+        frame_filter = ttk.Frame(parent)
+        label_filter = tk.Label(frame_filter, text='Filter:', font=self.font1)
+        self.e_filter = ttk.Entry(frame_filter, font=self.font1)
+        label_filter.pack(side=tk.LEFT, padx=5)
+        self.e_filter.pack(fill=tk.X, expand=1)
+
+        frame_filter.pack(fill=tk.X, side=tk.TOP)
         yscrollbar.pack(fill=tk.Y, side=tk.RIGHT)
         self.treeview.pack(fill=tk.BOTH, expand=1)
         
@@ -199,6 +278,8 @@ class App(tk.Tk):
                                              'August', 'September', 'October', 'November', 'December'])
         self.cb_year = ttk.Combobox(frame_date, state='normal', width=5)
         self.cb_period = ttk.Combobox(parent, state='readonly', values=['Day', 'Week', 'Month', 'Quarter'], width=15)
+        self.cb_ledger = ttk.Combobox(parent, state='readonly', width=15,
+                                      values=['All'] + [ledgers.ledger_name(f) for f in self.filenames])
 
         #labels
         label_amount = tk.Label(parent, text='Amount:', font=self.font1)
@@ -206,6 +287,7 @@ class App(tk.Tk):
         label_type = tk.Label(parent, text='Type:', font=self.font1)
         label_date = tk.Label(parent, text='Date:', font=self.font1)
         label_period = tk.Label(parent, text='Period (Income):', font=self.font1)
+        label_ledger = tk.Label(parent, text='Ledger:', font=self.font1)
         #Enter button
         self.enter_button = tk.Button(parent, text='Enter', font=self.font1, command=self.add_transaction)
         self.enter_button.config(width=15, height=4)
@@ -237,6 +319,8 @@ class App(tk.Tk):
         self.cb_period.grid(row=1, column=3)
         self.show_all_button.grid(row=2, column=3)
         self.open_calc_button.grid(row=3, column=3)
+        label_ledger.grid(row=0, column=4)
+        self.cb_ledger.grid(row=1, column=4, padx=5)
 
         parent.columnconfigure(1, weight=2, minsize=170)
         parent.columnconfigure(2, weight=1, minsize=140)
@@ -247,6 +331,7 @@ class App(tk.Tk):
         self.cb_month.current(dt.date.today().month - 1)
         self.cb_year.set(dt.date.today().year)
         self.cb_period.current(self.default_period)
+        self.cb_ledger.current(0)
 
     def init_top_right_frame(self, parent):
         self.notebook = ttk.Notebook(parent, takefocus=False)
@@ -256,6 +341,10 @@ class App(tk.Tk):
         self.main_graph_frame = ttk.Frame(self.notebook)
         self.notebook.add(frame1, text='Analysis')
         self.notebook.add(frame2, text='Analysis 2')
+        self.names_frame = ttk.Frame(self.notebook)
+        self.trend_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.names_frame, text='Descriptions')
+        self.notebook.add(self.trend_frame, text='Trends')
         self.notebook.add(self.main_graph_frame, text='Graphs')
         
         #first tab (treeview2)
@@ -306,15 +395,81 @@ class App(tk.Tk):
         yscrollbar2.pack(fill=tk.Y, side=tk.RIGHT)
         self.treeview3.pack(fill=tk.BOTH, expand=1)
 
-        #third tab (graph)
+        #third and fourth tabs (treeview4/treeview5)
+        self.init_name_tabs()
+
+        #last tab (graph)
         self.create_figures(self.main_graph_frame)
     
+    def init_name_tabs(self):
+        #largest descriptions of each period (treeview4) and the totals of one description (treeview5),
+        #by description or by category (analytics.normalize_name)
+        option_frame4 = ttk.Frame(self.names_frame)
+        label_group4 = tk.Label(option_frame4, text='Group by:', font=self.font1)
+        self.cb_group4 = ttk.Combobox(option_frame4, width=12, state='readonly', values=['Description', 'Category'])
+        label_group4.pack(side=tk.LEFT, padx=5)
+        self.cb_group4.pack(side=tk.LEFT)
+        option_frame4.pack(fill=tk.X, side=tk.TOP)
+
+        self.treeview4 = ttk.Treeview(self.names_frame, columns=list(range(1, self.top_names + 3)), displaycolumns='#all',
+                                      selectmode='browse', show=['headings'])
+        self.treeview4.heading(1, text='* ago', anchor=tk.CENTER)
+        self.treeview4.heading(2, text='Period', anchor=tk.CENTER)
+        self.treeview4.column(1, anchor=tk.CENTER, minwidth=40, stretch=False, width=40)
+        self.treeview4.column(2, anchor=tk.CENTER, minwidth=80, stretch=False, width=80)
+        for n in range(self.top_names):
+            self.treeview4.heading(n + 3, text={0:'1st', 1:'2nd', 2:'3rd'}.get(n, '{}th'.format(n + 1)), anchor=tk.CENTER)
+            self.treeview4.column(n + 3, anchor=tk.W, minwidth=80, stretch=True, width=130)
+        self.treeview4.tag_configure('font', font=self.font3)
+
+        yscrollbar4 = ttk.Scrollbar(self.names_frame, orient='vertical', command=self.treeview4.yview)
+        self.treeview4.config(yscrollcommand=yscrollbar4.set)
+        yscrollbar4.pack(fill=tk.Y, side=tk.RIGHT)
+        self.treeview4.pack(fill=tk.BOTH, expand=1)
+
+        option_frame5 = ttk.Frame(self.trend_frame)
+        label_group5 = tk.Label(option_frame5, text='Group by:', font=self.font1)
+        self.cb_group5 = ttk.Combobox(option_frame5, width=12, state='readonly', values=['Description', 'Category'])
+        label_trend = tk.Label(option_frame5, text='Show:', font=self.font1)
+        #descriptions (or categories) with transactions, largest total first
+        self.cb_trend = ttk.Combobox(option_frame5, width=25, state='readonly', values=[])
+        label_group5.pack(side=tk.LEFT, padx=5)
+        self.cb_group5.pack(side=tk.LEFT)
+        label_trend.pack(side=tk.LEFT, padx=5)
+        self.cb_trend.pack(side=tk.LEFT)
+        option_frame5.pack(fill=tk.X, side=tk.TOP)
+
+        self.treeview5 = ttk.Treeview(self.trend_frame, columns=[1,2,3,4,5], displaycolumns='#all', selectmode='browse', show=['headings'])
+        self.treeview5.heading(1, text='* ago', anchor=tk.CENTER)
+        self.treeview5.heading(2, text='Period', anchor=tk.CENTER)
+        self.treeview5.heading(3, text='Amount', anchor=tk.CENTER)
+        self.treeview5.heading(4, text='Change', anchor=tk.CENTER)
+        self.treeview5.heading(5, text='Average (4)', anchor=tk.CENTER)
+        self.treeview5.column(1, anchor=tk.CENTER, minwidth=40, stretch=False, width=40)
+        self.treeview5.column(2, anchor=tk.CENTER, minwidth=80, stretch=False, width=80)
+        self.treeview5.column(3, anchor=tk.E, minwidth=57, stretch=True, width=90)
+        self.treeview5.column(4, anchor=tk.E, minwidth=57, stretch=True, width=90)
+        self.treeview5.column(5, anchor=tk.E, minwidth=57, stretch=True, width=90)
+        self.treeview5.tag_configure('font', font=self.font3)
+
+        yscrollbar5 = ttk.Scrollbar(self.trend_frame, orient='vertical', command=self.treeview5.yview)
+        self.treeview5.config(yscrollcommand=yscrollbar5.set)
+        yscrollbar5.pack(fill=tk.Y, side=tk.RIGHT)
+        self.treeview5.pack(fill=tk.BOTH, expand=1)
+
+        self.cb_group4.current(0)
+        self.cb_group5.current(1)
+
     def init_bot_right_frame(self, parent):
         #labels
         label_period2 = tk.Label(parent, text='Period (Analysis):', font=self.font1)
         self.average_text1, self.average_text2 = tk.StringVar(), tk.StringVar()
         self.label_average1 = tk.Label(parent, font=self.font2, anchor='e', width=16, textvariable=self.average_text1)
         self.label_average2 = tk.Label(parent, font=self.font2, anchor='e', width=16, textvariable=self.average_text2)
+        #median, std, min and max of the same ranges
+        self.stats_text1, self.stats_text2 = tk.StringVar(), tk.StringVar()
+        self.label_stats1 = tk.Label(parent, font=self.font3, anchor='w', textvariable=self.stats_text1)
+        self.label_stats2 = tk.Label(parent, font=self.font3, anchor='w', textvariable=self.stats_text2)
         label_average = tk.Label(parent, text='Average:', font=self.font1)
         label_comma1 = tk.Label(parent, text=':', font=self.font1)
         label_comma2 = tk.Label(parent, text=':', font=self.font1)
@@ -323,7 +478,7 @@ class App(tk.Tk):
         label_ago1 = tk.Label(parent, text='* ago', font=self.font1)
         label_ago2 = tk.Label(parent, text='* ago', font=self.font1)
         #Comboboxes
-        self.cb_period2 = ttk.Combobox(parent, width=16, state='readonly', values=['Week', 'Month', 'Quarter', 'Year'])
+        self.cb_period2 = ttk.Combobox(parent, width=16, state='readonly', values=['Week', 'Month', 'Quarter', 'Year', 'Fortnight', 'Fiscal Year'])
         self.cb_average1 = ttk.Combobox(parent, width=12, state='readonly',
                                         values=['NONE', 'Needed', 'Extra', 'Income', 'Special', 'Bonuses', 'Essentials', 'Plus Extras', 'Net'])
         self.cb_average2 = ttk.Combobox(parent, width=12, state='readonly',
@@ -347,6 +502,8 @@ class App(tk.Tk):
         label_to.grid(row=2, column=3)
         self.cb_end.grid(row=2, column=4, sticky='ew')
         label_ago2.grid(row=2, column=5)
+        self.label_stats1.grid(row=1, column=7, padx=10, sticky='w')
+        self.label_stats2.grid(row=2, column=7, padx=10, sticky='w')
 
         label_period2.grid(row=0, column=6, padx=10)
         self.cb_period2.grid(row=1, column=6)
@@ -363,6 +520,7 @@ class App(tk.Tk):
         self.info_box = tk.Label(parent, font=self.font4, anchor=tk.W, textvariable=self.info_text)
         self.info_box.pack(fill='both', expand=1)
 
+    #only the frames are made here, the figures are made when they are first shown (build_figure1/build_figure2)
     def create_figures(self, parent):
         self.graph_frame1 = ttk.Frame(parent)
         self.toolbar_frame1 = ttk.Frame(parent)
@@ -371,24 +529,14 @@ class App(tk.Tk):
         option_frame = ttk.Frame(parent)
         parent.rowconfigure(0, weight=1)
         parent.columnconfigure(0, weight=1)
-        
-        figure1 = Figure(figsize=(0.1,0.1))
-        self.axes1 = figure1.add_subplot(111)
-        self.canvas1 = FigureCanvasTkAgg(figure1, self.graph_frame1)
-        self.canvas1.draw()
-        self.canvas1.get_tk_widget().pack(fill='both', expand=1)
-        toolbar1 = NavigationToolbar2Tk(self.canvas1, self.toolbar_frame1)
-        toolbar1.update()
-        self.canvas1._tkcanvas.pack(fill='both', expand=1)
-
-        figure2 = Figure(figsize=(0.1,0.1))
-        self.axes2 = figure2.add_subplot(111)
-        self.canvas2 = FigureCanvasTkAgg(figure2, self.graph_frame2)
-        self.canvas2.draw()
-        self.canvas2.get_tk_widget().pack(fill='both', expand=1)
-        toolbar2 = NavigationToolbar2Tk(self.canvas1, self.toolbar_frame2)
-        toolbar2.update()
-        self.canvas2._tkcanvas.pack(fill='both', expand=1)
+        #None until built
+        self.axes1 = self.canvas1 = None
+        #bars of axes1 and (analysis period, '* ago' of the periods), kept so only their size and place change
+        #graph_heights is the height of each period, the bars show their averages (layout_graph)
+        self.bars1 = None
+        self.bars1_x = None
+        self.graph_heights = None
+        self.axes2 = self.canvas2 = None
 
         self.cb_graph = ttk.Combobox(option_frame, width=10, state='readonly', values=['Bar Graph', 'Other'])
         self.check_var1 = tk.IntVar()
@@ -397,15 +545,15 @@ class App(tk.Tk):
         self.check_var4 = tk.IntVar()
         self.check_var5 = tk.IntVar()
         self.check_graph1 = ttk.Checkbutton(option_frame, text='1', variable=self.check_var1,
-                                            command=lambda: self.create_graphs(self.analysis))
+                                            command=self.update_graph_heights)
         self.check_graph2 = ttk.Checkbutton(option_frame, text='2', variable=self.check_var2,
-                                            command=lambda: self.create_graphs(self.analysis))
+                                            command=self.update_graph_heights)
         self.check_graph3 = ttk.Checkbutton(option_frame, text='3', variable=self.check_var3,
-                                            command=lambda: self.create_graphs(self.analysis))
+                                            command=self.update_graph_heights)
         self.check_graph4 = ttk.Checkbutton(option_frame, text='4', variable=self.check_var4,
-                                            command=lambda: self.create_graphs(self.analysis))
+                                            command=self.update_graph_heights)
         self.check_graph5 = ttk.Checkbutton(option_frame, text='5', variable=self.check_var5,
-                                            command=lambda: self.create_graphs(self.analysis))
+                                            command=self.update_graph_heights)
         self.check_graph1.pack(side='left', expand=1)
         self.check_graph2.pack(side='left', expand=1)
         self.check_graph3.pack(side='left', expand=1)
@@ -418,7 +566,31 @@ class App(tk.Tk):
         option_frame.grid(row=1, column=1, ipadx=10, sticky='ewns')
 
         self.cb_graph.current(0)
-        self.axes1.invert_xaxis()
+
+    def build_figure(self, graph_frame, toolbar_frame):
+        #returns axes, canvas
+        Figure, FigureCanvasTkAgg, NavigationToolbar2Tk = import_matplotlib()
+        figure = Figure(figsize=(0.1,0.1))
+        axes = figure.add_subplot(111)
+        canvas = FigureCanvasTkAgg(figure, graph_frame)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill='both', expand=1)
+        toolbar = NavigationToolbar2Tk(canvas, toolbar_frame)
+        toolbar.update()
+        return axes, canvas
+
+    def build_figure1(self):
+        if self.axes1 == None:
+            start = time.perf_counter()
+            self.axes1, self.canvas1 = self.build_figure(self.graph_frame1, self.toolbar_frame1)
+            self.axes1.invert_xaxis()
+            self.create_graphs(self.analysis)
+            if self.startup_times != None:
+                print('Bar graph built in {:.3f}s (matplotlib import and first draw)'.format(time.perf_counter() - start))
+
+    def build_figure2(self):
+        if self.axes2 == None:
+            self.axes2, self.canvas2 = self.build_figure(self.graph_frame2, self.toolbar_frame2)
 
     '''EVENTS AND BINDINGS ----------------------------------------------------------'''
     def create_events(self):
@@ -461,20 +633,32 @@ class App(tk.Tk):
         self.delete_last_button.bind('<KeyPress-Left>', self.focus6)
         self.delete_last_button.bind('<KeyPress-Up>', self.focus3)
 
+        #fill in periods when they are opened
+        self.treeview.bind('<<TreeviewOpen>>', self.open_period)
+        self.treeview.bind('<<TreeviewSelect>>', self.select_earlier)
+        #filter the journal as it is typed
+        self.e_filter.bind('<KeyRelease>', self.change_filter)
+
         #select new period
         self.cb_period.bind('<<ComboboxSelected>>', self.change_period)
         self.cb_period2.bind('<<ComboboxSelected>>', self.change_period2)
+        #show one ledger or all
+        self.cb_ledger.bind('<<ComboboxSelected>>', self.change_ledger)
 
         #select new graph type
         self.cb_graph.bind('<<ComboboxSelected>>', self.change_graph)
+        #the graphs are built when the tab is first shown
+        self.notebook.bind('<<NotebookTabChanged>>', self.change_tab)
+        #descriptions or categories, and the one whose trend is shown
+        self.cb_group4.bind('<<ComboboxSelected>>', lambda e: self.show_top_names())
+        self.cb_group5.bind('<<ComboboxSelected>>', lambda e: self.show_trend())
+        self.cb_trend.bind('<<ComboboxSelected>>', lambda e: self.show_trend())
 
         #select new average to analyse
         self.cb_average1.bind('<<ComboboxSelected>>', lambda e: self.change_average(e, 1))
         self.cb_average2.bind('<<ComboboxSelected>>', lambda e: self.change_average(e, 2))
-        self.cb_start.bind('<<ComboboxSelected>>', lambda e: self.change_average(e, 1))
-        self.cb_start.bind('<<ComboboxSelected>>', lambda e: self.change_average(e, 2), add='+')
-        self.cb_end.bind('<<ComboboxSelected>>', lambda e: self.change_average(e, 1))
-        self.cb_end.bind('<<ComboboxSelected>>', lambda e: self.change_average(e, 2), add='+')
+        self.cb_start.bind('<<ComboboxSelected>>', self.change_range)
+        self.cb_end.bind('<<ComboboxSelected>>', self.change_range)
 
     '''EVENT HANDLERS --------------------------------------------------------------------------------------'''
     def ask_quit(self):
@@ -546,19 +730,57 @@ class App(tk.Tk):
     def change_period2(self, event):
         cur_period = self.cb_period2.current() + 1
         if cur_period != self.period2:
-            dict_ = {0:'Days', 1:'Weeks', 2:'Months', 3:'Quarters', 4:'Years'}
+            dict_ = {0:'Days', 1:'Weeks', 2:'Months', 3:'Quarters', 4:'Years', 5:'Fortnights', 6:'Fiscal years'}
             self.period2 = cur_period
-            self.init_analysis()
-            self.info_text.set('Analysis period changed to: {}'.format(dict_[self.period2]))
+            self.start_analysis('Analysis period changed to: {}'.format(dict_[self.period2]))
+
+    def change_ledger(self, event):
+        ledger = None if self.cb_ledger.current() == 0 else self.cb_ledger.current() - 1
+        if ledger != self.ledger and not self.loading:
+            self.ledger = ledger
+            #a copy of the ledger's rows, made only when the selection changes
+            if ledger == None:
+                self.transactions = self.all_transactions
+            else:
+                self.transactions = ledgers.split(self.all_transactions, ledger)
+            self.daily_totals = None
+            self.transactions_changed()
+            self.show_file_contents()
+            self.start_analysis('Showing ledger: {}'.format(self.cb_ledger.get()))
+
+    def change_filter(self, event):
+        text = self.e_filter.get()
+        if text == self.filter_text:
+            return
+        try:
+            query = search.parse(text)
+        except ValueError as e:
+            self.info_text.set('Filter: {}'.format(e))
+            return
+        self.filter_text = text
+        self.filter_query = None if query.is_empty() else query
+        self.show_file_contents()
+        if self.filter_query == None:
+            self.info_text.set('Filter cleared')
+
+    def change_tab(self, event):
+        self.update_name_tabs()
+        if self.notebook.select() == str(self.main_graph_frame):
+            if self.cb_graph.current() == 0:
+                self.build_figure1()
+            else:
+                self.build_figure2()
 
     def change_graph(self, event):
         current = self.main_graph_frame.grid_slaves(column=0)
         if self.cb_graph.current() == 0:
+            self.build_figure1()
             current[0].grid_forget()
             current[1].grid_forget()
             self.graph_frame1.grid(row=0, column=0, columnspan=2, sticky='ewns')
             self.toolbar_frame1.grid(row=1, column=0, sticky='ewns')
         elif self.cb_graph.current() == 1:
+            self.build_figure2()
             current[0].grid_forget()
             current[1].grid_forget()
             self.graph_frame2.grid(row=0, column=0, columnspan=2, sticky='ewns')
@@ -569,177 +791,283 @@ class App(tk.Tk):
     def change_average(self, event, num):
         self.set_average_text(self.analysis, num)
 
+    def change_range(self, event):
+        #both averages use cb_start/cb_end
+        self.set_average_text(self.analysis, 1)
+        self.set_average_text(self.analysis, 2)
+
     """COMMANDS/EXECUTIONS ==========================================================="""
     def load_file(self, filename):
-        file = open(filename, 'r')
-        self.transactions = []
-        lines = file.readlines()
-        file.close()
-        comparison = '[PACX save file]\n'
-        if lines[0] == comparison:
-            lines = lines[1:]
-            for line in lines:
-                if line[:3] == 't//':
-                    self.transactions += [self.parse_txt_file(line[:-1])]
-                else:
-                    raise IOError('file transaction indent error')
-            self.transactions.sort(key=lambda t: t.get_date())
+        #text/binary save file or SQLite database, self.transactions is sorted by date
+        backend = storage.open_backend(filename)
+        self.set_ledgers([backend], backend.load())
+
+    def set_ledgers(self, backends, store):
+        #backends of the open files, store is all their transactions (ledgers.merge)
+        self.backends = backends
+        self.all_transactions = self.transactions = store
+        self.ledger = None
+        self.daily_totals = None
+        #an analysis on its way is of the transactions before
+        self.worker.cancel('analysis')
+        self.job_texts.pop('analysis', None)
+        self.transactions_changed()
+
+    def set_title(self):
+        if self.filename == None:
+            self.title('PACX - "New"')
+        else:
+            self.title('PACX - ' + ', '.join(['"' + f + '"' for f in self.filenames]))
+
+    '''BACKGROUND JOBS (worker thread) ---------------------------------------------------------------------------'''
+    #the jobs do not touch tkinter or self, their results are used in finish_job
+    def start_loading(self, filenames):
+        #load_file (merging several files) and init_analysis in the worker thread, entries are refused until it is done
+        self.loading = True
+        self.start_job('load', 'Loading {} file(s)'.format(len(filenames)), load_job, filenames, self.period2)
+
+    def start_analysis(self, done_text='Analysis updated'):
+        #init_analysis in the worker thread, on a copy of the transactions, done_text is shown when it is done
+        #a newer analysis (eg. the period is changed again) cancels this one
+        self.analysis_done_text = done_text
+        if len(self.transactions) == 0 or self.loading:
+            self.worker.cancel('analysis')
+            if not self.loading:
+                self.init_analysis()
+                self.info_text.set(done_text)
+        else:
+            period_totals, analysis = self.known_analysis()
+            if period_totals != None:
+                self.worker.cancel('analysis')
+                self.show_analysis(period_totals, analysis)
+                self.info_text.set(done_text)
+            else:
+                self.start_job('analysis', 'Analysing', analysis_job, self.transactions.copy(), self.period2, self.version)
+
+    def known_analysis(self):
+        #(PeriodTotals, analysis) of self.period2 that need no grouping: shown before (self.analysis_cache), or only the
+        #totals, kept by the storage of the file (storage.TotalsCache) or summed from self.daily_totals (the analysis is
+        #None), else (None, None)
+        known = self.analysis_cache.get(('analysis', self.period2), self.version)
+        if known != None:
+            return known
+        period_totals = self.cached_period_totals()
+        if period_totals == None and self.daily_totals != None and len(self.transactions) > 0:
+            period_totals = analytics.PeriodTotals(self.daily_totals, self.period2)
+        return period_totals, None
+
+    def get_daily_totals(self):
+        if self.daily_totals == None:
+            self.daily_totals = analytics.DailyTotals(self.transactions)
+        return self.daily_totals
+
+    def cached_period_totals(self):
+        #totals of self.period2 kept by the storage of the open file, None if there are none (eg. several files)
+        if len(self.backends) != 1 or self.transactions is not self.all_transactions or len(self.transactions) == 0:
+            return None
+        period_totals = self.backends[0].cached_period_totals(self.period2)
+        key_range = (analytics.period_key(self.transactions.get_date(0), self.period2),
+                     analytics.period_key(self.transactions.get_date(-1), self.period2))
+        if period_totals == None or period_totals.get_key_range() != key_range:
+            return None
+        return period_totals
+
+    def start_job(self, channel, text, function, *args):
+        self.worker.submit(channel, function, *args)
+        #the newest job last
+        self.job_texts.pop(channel, None)
+        self.job_texts[channel] = [text, time.perf_counter()]
+        self.info_text.set(text + '...')
+        if not self.polling:
+            self.polling = True
+            self.after(50, self.poll_worker)
+
+    def poll_worker(self):
+        for channel, kind, value in self.worker.poll():
+            if kind == 'progress':
+                if channel in self.job_texts:
+                    self.job_texts[channel][0] = value
+            elif kind == 'error':
+                if channel == 'load':
+                    self.loading = False
+                self.info_text.set('Error: {}'.format(value))
+                self.job_texts.pop(channel, None)
+            else:
+                self.job_texts.pop(channel, None)
+                self.finish_job(channel, value)
+        if self.worker.has_pending():
+            if len(self.job_texts) > 0:
+                text, start = list(self.job_texts.values())[-1]
+                self.info_text.set('{}... ({:.1f}s)'.format(text, time.perf_counter() - start))
+            self.after(50, self.poll_worker)
         else:
-            raise IOError('File incompatible')
+            self.polling = False
+
+    def finish_job(self, channel, result):
+        if channel == 'load':
+            backends, store, period2, daily_totals, period_totals = result
+            self.set_ledgers(backends, store)
+            self.daily_totals = daily_totals
+            self.cb_ledger.config(values=['All'] + [ledgers.ledger_name(f) for f in self.filenames])
+            self.cb_ledger.current(0)
+            self.loading = False
+            self.show_file_contents()
+            if period2 == self.period2:
+                self.show_analysis(period_totals)
+                self.info_text.set('Loaded {} transactions'.format(len(self.transactions)))
+            else:
+                self.start_analysis('Loaded {} transactions'.format(len(self.transactions)))
+            if self.startup_times != None:
+                self.startup_mark('load file and show (worker)')
+                self.print_startup_times()
+        elif channel == 'analysis':
+            period2, version, daily_totals, period_totals = result
+            #of transactions changed since (eg. another file was opened)
+            if version != self.version:
+                return
+            if self.daily_totals == None:
+                self.daily_totals = daily_totals
+            if period2 == self.period2:
+                self.show_analysis(period_totals)
+                self.info_text.set(self.analysis_done_text)
 
     #show from self.transactions
+    #only the last period is filled in, the others get their transactions when they are opened (populate_period)
+    #in days, only the last self.day_window transactions are shown, the "earlier" item shows more
     def show_file_contents(self):
         self.treeview.delete(*self.treeview.get_children())
         self.treeview.yview('moveto', 0)
+        self.lazy_periods = {}
+        self.day_start = 0
+        self.period_item_keys = []
+        self.period_items = {}
+        if self.filter_query != None:
+            self.show_results()
         #if there are transactions
-        if len(self.transactions) > 0:
+        elif len(self.transactions) > 0:
             #days
             if self.period == 0:
-                for t in self.transactions:
-                    self.t_to_screen('', t, index='end')
+                self.show_earlier_days(len(self.transactions))
                 #see fully the selected line
                 self.treeview.yview('moveto', 0)
                 self.select_line(self.treeview, self.treeview.get_children()[-1])
-                    
-            #weeks
-            elif self.period == 1:
-                #{weekday:[difference days to monday, difference days to sunday]}
-                dict_ = {0:[0, 6], 1:[1, 5], 2:[2, 4], 3:[3, 3], 4:[4, 2], 5:[5, 1], 6:[6, 0]}
-                #insert first transaction
-                date, weekday = self.transactions[0].get_date(), self.transactions[0].get_date().weekday()
-                self.t_to_screen_newperiod(self.transactions[0], index='end')
-                if len(self.transactions) >= 2:
-                    #insert the rest
-                    for t in self.transactions[1:]:
-                        delta = t.get_date() - date
-                        if delta.days <= dict_[weekday][1]:
-                            self.t_to_screen(self.treeview.get_children()[-1], t, index='end')
-                        else:
-                            date, weekday = t.get_date(), t.get_date().weekday()
-                            self.t_to_screen_newperiod(t, index='end')
-
-                #close other children
-                if len(self.treeview.get_children()) > 1:
-                    for child in self.treeview.get_children()[:-1]:
-                        self.treeview.item(child, open=False)
-                #see fully the selected line
-                self.select_line(self.treeview, self.treeview.get_children(self.treeview.get_children()[-1])[-1])
-                
-            #months
-            elif self.period == 2:
-                month, year = None, None
-                for t in self.transactions:
-                    if t.get_date().month == month and t.get_date().year == year:
-                        self.t_to_screen(self.treeview.get_children()[-1], t, index='end')
-                    else:
-                        month, year = t.get_date().month, t.get_date().year
-                        self.t_to_screen_newperiod(t, index='end')
-                
-                if len(self.treeview.get_children()) > 1:
-                    for child in self.treeview.get_children()[:-1]:
-                        self.treeview.item(child, open=False)
-                #see fully the selected line
-                self.select_line(self.treeview, self.treeview.get_children(self.treeview.get_children()[-1])[-1])
-            #quarters
-            elif self.period == 3:
-                dict_ = {1:[1, 2, 3], 2:[4, 5, 6], 3:[7, 8, 9], 4:[10, 11, 12], None:[None]}
-                quarter, year = None, None
-                for t in self.transactions:
-                    if t.get_date().month in dict_[quarter] and t.get_date().year == year:
-                        self.t_to_screen(self.treeview.get_children()[-1], t, index='end')
-                    else:
-                        quarter, year = math.ceil(t.get_date().month / 3), t.get_date().year
-                        self.t_to_screen_newperiod(t, 'end')
-                
-                if len(self.treeview.get_children()) > 1:
-                    for child in self.treeview.get_children()[:-1]:
-                        self.treeview.item(child, open=False)
+
+            #weeks/months/quarters
+            elif self.period in [1, 2, 3]:
+                #first row of each period
+                starts = self.view_starts().tolist()
+                for start in starts[:-1]:
+                    i = self.period_to_screen(self.transactions.get_date(start), index='end')
+                    #placeholder so the period can be opened
+                    self.treeview.insert(i, 'end', iid=i + ' lazy')
+                    self.lazy_periods[i] = analytics.period_key(self.transactions.get_date(start), self.period)
+                i = self.period_to_screen(self.transactions.get_date(starts[-1]), index='end')
+                self.rows_to_screen(i, starts[-1], len(self.transactions))
+                self.treeview.item(i, open=True)
                 #see fully the selected line
                 self.select_line(self.treeview, self.treeview.get_children(self.treeview.get_children()[-1])[-1])
         #do nothing if there are no transactions
         else:
             pass
 
+    def show_results(self):
+        #filtered view: the last self.day_window transactions matching self.filter_query, not grouped
+        if self.search_index == None or not self.search_index.is_for(self.transactions):
+            self.search_index = search.SearchIndex(self.transactions)
+        self.results = self.search_index.find(self.filter_query)
+        self.results_start = max(0, len(self.results) - self.day_window)
+        self.indexes_to_screen('', self.results[self.results_start:])
+        if len(self.results) > 0:
+            self.select_line(self.treeview, self.treeview.get_children()[-1])
+        if self.results_start > 0:
+            self.info_text.set('{} matching transactions, showing the last {}'.format(len(self.results), self.day_window))
+        else:
+            self.info_text.set('{} matching transactions'.format(len(self.results)))
+
+    def add_to_results(self, index, t):
+        #filtered view: t has been inserted at index of self.transactions, the rows after it moved down one
+        position = int(np.searchsorted(self.results, index))
+        self.results[position:] += 1
+        if self.filter_query.matches(t):
+            self.results = np.insert(self.results, position, index)
+            if position < self.results_start:
+                self.results_start += 1
+            else:
+                i = self.t_to_screen('', t, index=position - self.results_start)
+                self.select_line(self.treeview, i)
+
+    def delete_from_results(self, index):
+        #filtered view: the last row of self.transactions (index) has been deleted
+        if len(self.results) > 0 and self.results[-1] == index:
+            self.results = self.results[:-1]
+            self.treeview.delete(self.treeview.get_children()[-1])
+            if len(self.treeview.get_children()) > 0:
+                self.select_line(self.treeview, self.treeview.get_children()[-1])
+            elif len(self.results) > 0:
+                self.show_file_contents()
+
+    def view_starts(self):
+        #first row of each period of the journal view (self.period 1-3)
+        key = ('view', self.period)
+        starts = self.analysis_cache.get(key, self.version)
+        if starts is None:
+            starts = analytics.period_starts(self.transactions.get_dates(), self.period)
+            self.analysis_cache.put(key, self.version, starts, starts.nbytes)
+        return starts
+
+    def transactions_changed(self):
+        #what was worked out from the transactions before is not used any more (self.analysis_cache)
+        self.version += 1
+
+    def populate_period(self, item):
+        #puts the transactions of a period item on screen, if it has not been done yet
+        if item in self.lazy_periods:
+            key = self.lazy_periods.pop(item)
+            start = self.transactions.bisect(analytics.key_to_date(key, self.period) - dt.timedelta(days=1))
+            end = self.transactions.bisect(analytics.key_to_date(key + 1, self.period) - dt.timedelta(days=1))
+            self.treeview.delete(item + ' lazy')
+            self.rows_to_screen(item, start, end)
+
+    def show_earlier_days(self, end):
+        #days: shows up to self.day_window transactions before index 'end' at the top
+        start = max(0, end - self.day_window)
+        if self.treeview.exists('earlier'):
+            self.treeview.delete('earlier')
+        self.rows_to_screen('', start, end, index=0)
+        self.day_start = start
+        if start > 0:
+            self.treeview.insert('', 0, iid='earlier', tags=['font2'], values=['...', 'Show earlier entries', '', ''])
+
+    def open_period(self, event):
+        #<<TreeviewOpen>>, the opened item has the focus
+        self.populate_period(self.treeview.focus())
+
+    def select_earlier(self, event):
+        if self.period == 0 and 'earlier' in self.treeview.selection():
+            self.show_earlier_days(self.day_start)
+            self.treeview.selection_remove('earlier')
+
     def init_analysis(self):
+        #get analysis per period, then display that.
+        period_totals, analysis = self.known_analysis()
+        if period_totals != None:
+            self.show_analysis(period_totals, analysis)
+        elif len(self.transactions) > 0:
+            self.show_analysis(analytics.PeriodTotals(self.get_daily_totals(), self.period2))
+        else:
+            self.show_analysis(None)
+
+    def show_analysis(self, period_totals, analysis=None):
+        #period_totals is the analytics.PeriodTotals of self.transactions in self.period2 (None if no transactions)
+        #analysis is its rows if they are known (known_analysis)
         self.treeview2.delete(*self.treeview2.get_children())
         self.treeview3.delete(*self.treeview3.get_children())
         self.treeview2.yview('moveto', 0)
         self.treeview3.yview('moveto', 0)
-        period_transaction_dict = {}
-        if len(self.transactions) > 0:
-            if self.period2 == 1:
-                dict_ = {0:[0, 6], 1:[1, 5], 2:[2, 4], 3:[3, 3], 4:[4, 2], 5:[5, 1], 6:[6, 0]}
-                #weeks are strings
-                min_week = self.convert_date_str(self.transactions[0].get_date() -
-                                                 dt.timedelta(days=self.transactions[0].get_date().weekday()))
-                max_week = self.convert_date_str(self.transactions[-1].get_date() -
-                                                 dt.timedelta(days=self.transactions[-1].get_date().weekday()))
-                
-                period_transaction_dict[min_week] = [self.transactions[0]]
-                if len(self.transactions) > 1:
-                    week = min_week
-                    for t in self.transactions[1:]:
-                        while t.get_date() - dt.timedelta(days=t.get_date().weekday()) != self.convert_date_str(week):
-                            week = self.convert_date_str(self.convert_date_str(week) + dt.timedelta(days=7))
-                            period_transaction_dict[week] = []
-                            if self.convert_date_str(week) > self.convert_date_str(max_week):
-                                raise ValueError('Strange Error (init_analysis)')
-                        period_transaction_dict[week].append(t)
-                
-            elif self.period2 == 2:
-                min_month = (self.transactions[0].get_date().month, self.transactions[0].get_date().year)
-                max_month = (self.transactions[-1].get_date().month, self.transactions[-1].get_date().year)
-                
-                period_transaction_dict[min_month] = [self.transactions[0]]
-                if len(self.transactions) > 1:
-                    month, year = min_month[0], min_month[1]
-                    for t in self.transactions[1:]:
-                        while (t.get_date().month, t.get_date().year) != (month, year):
-                            if month < 12:
-                                month = month + 1
-                            else:
-                                month = 1
-                                year = year + 1
-                            period_transaction_dict[(month, year)] = []
-                            if year > max_month[1]:
-                                raise ValueError('Strange Error (init_analysis)')
-                        period_transaction_dict[(month, year)].append(t)
-                
-            elif self.period2 == 3:
-                min_quarter = (math.ceil(self.transactions[0].get_date().month / 3), self.transactions[0].get_date().year)
-                max_quarter = (math.ceil(self.transactions[-1].get_date().month / 3), self.transactions[-1].get_date().year)
-                
-                period_transaction_dict[min_quarter] = [self.transactions[0]]
-                if len(self.transactions) > 1:
-                    quarter, year = min_quarter[0], min_quarter[1]
-                    for t in self.transactions[1:]:
-                        while (math.ceil(t.get_date().month / 3), t.get_date().year) != (quarter, year):
-                            if quarter < 4:
-                                quarter = quarter + 1
-                            else:
-                                quarter = 1
-                                year = year + 1
-                            period_transaction_dict[(quarter, year)] = []
-                            if year > max_quarter[1]:
-                                raise ValueError('Strange Error (init_analysis)')
-                        period_transaction_dict[(quarter, year)].append(t)
-                
-            elif self.period2 == 4:
-                min_year = self.transactions[0].get_date().year
-                max_year = self.transactions[-1].get_date().year
-                
-                period_transaction_dict[min_year] = [self.transactions[0]]
-                if len(self.transactions) > 1:
-                    year = min_year
-                    for t in self.transactions[1:]:
-                        while t.get_date().year != year:
-                            year = year + 1
-                            period_transaction_dict[year] = []
-                        
-                        period_transaction_dict[year].append(t)
-            
-            #get analysis from 'period_transaction_dict', then display that.
-            self.analysis = self.analyse_data(period_transaction_dict, self.transactions[0].get_date(), self.transactions[-1].get_date())
+        if period_totals != None:
+            self.period_totals = period_totals
+            self.analysis = self.period_totals.rows() if analysis == None else analysis
+            self.remember_analysis()
             
             self.display_analysis(self.analysis)
 
@@ -753,134 +1081,140 @@ class App(tk.Tk):
             self.set_average_text(self.analysis, 2)
 
         else:
-            pass
+            #nothing left of the transactions before (eg. the last one was deleted, another file is loading)
+            self.period_totals = None
+            self.analysis = []
+            self.create_graphs(self.analysis)
+            self.cb_start.config(values=[])
+            self.cb_end.config(values=[])
+            self.cb_start.set('')
+            self.cb_end.set('')
+            self.set_average_text(self.analysis, 1)
+            self.set_average_text(self.analysis, 2)
+        self.update_name_tabs()
 
-    def analyse_data(self, period_dict, min_date, max_date):
-        items_to_return = []
-        
-        if self.period2 == 1:
-            min_week_date = min_date - dt.timedelta(days=min_date.weekday())
-            week = self.convert_date_str(min_week_date)
-            weeks_ago = (dt.date.today() - dt.timedelta(days=dt.date.today().weekday()))  - min_week_date
-            weeks_ago = weeks_ago.days // 7
-            while self.convert_date_str(week) <= max_date:
-                period_str = week
-                temp_dict = {'ago':weeks_ago, 'period':period_str, 1:0, 2:0, 3:0, 4:0, 5:0}
-                for t in period_dict[week]:
-                    temp_dict[t.get_type()] += float(t.get_amount())
-                items_to_return.append(temp_dict)
-                week = self.convert_date_str(self.convert_date_str(week) + dt.timedelta(days=7))
-                weeks_ago -= 1
-            
-        elif self.period2 == 2:
-            month, year = min_date.month, min_date.year
-            months_ago = (dt.date.today().year - year) * 12 + (dt.date.today().month - month)
-            while (month, year) != (max_date.month, max_date.year):
-                period_str = '{} {}'.format(self.month_name(month), str(year))
-                temp_dict = {'ago':months_ago, 'period':period_str, 1:0, 2:0, 3:0, 4:0, 5:0}
-                for t in period_dict[(month, year)]:
-                    temp_dict[t.get_type()] += float(t.get_amount())
-                items_to_return.append(temp_dict)
-                if month < 12:
-                    month = month + 1
-                else:
-                    month = 1
-                    year = year + 1
-                months_ago -= 1
-            period_str = '{} {}'.format(self.month_name(month), str(year))
-            temp_dict = {'ago':months_ago, 'period':period_str, 1:0, 2:0, 3:0, 4:0, 5:0}
-            for t in period_dict[(month, year)]:
-                temp_dict[t.get_type()] += float(t.get_amount())
-            items_to_return.append(temp_dict)
-            
-        elif self.period2 == 3:
-            quarter, year = math.ceil(min_date.month / 3), min_date.year
-            quarters_ago = (dt.date.today().year - year) * 4 + (math.ceil(dt.date.today().month / 3) - quarter)
-            while (quarter, year) != (math.ceil(max_date.month / 3), max_date.year):
-                period_str = 'Q{0} {1}'.format(quarter, str(year))
-                temp_dict = {'ago':quarters_ago, 'period':period_str, 1:0, 2:0, 3:0, 4:0, 5:0}
-                for t in period_dict[(quarter, year)]:
-                    temp_dict[t.get_type()] += float(t.get_amount())
-                items_to_return.append(temp_dict)
-                if quarter < 4:
-                    quarter = quarter + 1
-                else:
-                    quarter = 1
-                    year = year + 1
-                quarters_ago -= 1
-            period_str = 'Q{0} {1}'.format(quarter, str(year))
-            temp_dict = {'ago':quarters_ago, 'period':period_str, 1:0, 2:0, 3:0, 4:0, 5:0}
-            for t in period_dict[(quarter, year)]:
-                temp_dict[t.get_type()] += float(t.get_amount())
-            items_to_return.append(temp_dict)
-            
-        elif self.period2 == 4:
-            year = min_date.year
-            years_ago = dt.date.today().year - year
-            while year <= max_date.year:
-                period_str = str(year)
-                temp_dict = {'ago':years_ago, 'period':period_str, 1:0, 2:0, 3:0, 4:0, 5:0}
-                for t in period_dict[year]:
-                    temp_dict[t.get_type()] += float(t.get_amount())
-                items_to_return.append(temp_dict)
-                year = year + 1
-                years_ago -= 1
-            
-        #returns a list of dictionaries for each period, with item data
-        return items_to_return
+    def remember_analysis(self):
+        #self.period_totals and self.analysis belong to this version, until they are changed (refresh_analysis)
+        self.analysis_cache.put(('analysis', self.period2), self.version, (self.period_totals, self.analysis),
+                                self.period_totals.get_totals().nbytes + len(self.analysis) * analytics.ROW_BYTES)
 
     def display_analysis(self, analysis):
-        for a in analysis:
+        #the amounts of all rows are formatted at once
+        amounts = [[analytics.category_value(a, c) for c in range(1, 9)] for a in analysis]
+        strs = formatting.currency_column(np.array(amounts).reshape(-1))
+        for n, a in enumerate(analysis):
+            row = strs[8 * n:8 * n + 8]
+            values2 = [a['ago'], a['period']] + row[:5]
+            values3 = [a['ago'], a['period']] + row[5:]
             #iid is period minus the whitespace
-            self.treeview2.insert('', 'end', iid=a['period'].replace(' ', ''), tags=['font'],
-                            values=[a['ago'], a['period'], self.currency(a[1]), self.currency(a[2]), self.currency(a[3]),
-                                    self.currency(a[4]), self.currency(a[5])])
-            self.treeview3.insert('', 'end', iid=a['period'].replace(' ', ''), tags=['font'],
-                                  values=[a['ago'], a['period'], self.currency(a[1] + a[3]),
-                                          self.currency(a[1] + a[2] + a[3]), self.currency(a[1] + a[2] + a[3] + a[4] + a[5])])
+            self.treeview2.insert('', 'end', iid=a['period'].replace(' ', ''), tags=['font'], values=values2)
+            self.treeview3.insert('', 'end', iid=a['period'].replace(' ', ''), tags=['font'], values=values3)
         self.treeview2.yview('moveto', 0)
         self.treeview2.see(self.treeview2.get_children()[-1])
         self.treeview3.yview('moveto', 0)
         self.treeview3.see(self.treeview3.get_children()[-1])
 
+    def analysis_values(self, a):
+        #row values of treeview2 and treeview3 for one period
+        values2 = [a['ago'], a['period'], self.currency(a[1]), self.currency(a[2]), self.currency(a[3]),
+                   self.currency(a[4]), self.currency(a[5])]
+        values3 = [a['ago'], a['period'], self.currency(a[1] + a[3]),
+                   self.currency(a[1] + a[2] + a[3]), self.currency(a[1] + a[2] + a[3] + a[4] + a[5])]
+        return values2, values3
+
     def create_graphs(self, analysis):
+        #nothing to draw on until the graph tab is shown
+        if self.axes1 == None:
+            return
+        dates = np.array([x['ago'] for x in analysis])
+        #same periods: the bars are kept, only their heights change
+        if self.bars1 != None and self.bars1_x[0] == self.period2 and np.array_equal(dates, self.bars1_x[1]):
+            self.update_graph_heights()
+            return
         self.axes1.clear()
-        self.axes2.clear()
         
         if self.period2 == 1:
-            dates = np.array([x['ago'] for x in analysis])
-            data = np.array([self.check_var1.get() * x[1] + self.check_var2.get() * x[2] + self.check_var3.get() * x[3] +
-                             self.check_var4.get() * x[4] + self.check_var5.get() * x[5] for x in analysis])
             self.axes1.set_xlabel('Weeks Ago')
-            #self.axes1.set_xticklabels(['W{}'.format(x['ago']) for x in analysis])
         elif self.period2 == 2:
-            dates = np.array([x['ago'] for x in analysis])
-            data = np.array([self.check_var1.get() * x[1] + self.check_var2.get() * x[2] + self.check_var3.get() * x[3] +
-                             self.check_var4.get() * x[4] + self.check_var5.get() * x[5] for x in analysis])
             self.axes1.set_xlabel('Months Ago')
-            #self.axes1.set_xticklabels(['M{}'.format(x['ago']) for x in analysis])
         elif self.period2 == 3:
-            dates = np.array([x['ago'] for x in analysis])
-            data = np.array([self.check_var1.get() * x[1] + self.check_var2.get() * x[2] + self.check_var3.get() * x[3] +
-                             self.check_var4.get() * x[4] + self.check_var5.get() * x[5] for x in analysis])
             self.axes1.set_xlabel('Quarters Ago')
         elif self.period2 == 4:
-            dates = np.array([x['ago'] for x in analysis])
-            data = np.array([self.check_var1.get() * x[1] + self.check_var2.get() * x[2] + self.check_var3.get() * x[3] +
-                             self.check_var4.get() * x[4] + self.check_var5.get() * x[5] for x in analysis])
             self.axes1.set_xlabel('Years Ago')
+        elif self.period2 == 5:
+            self.axes1.set_xlabel('Fortnights Ago')
+        elif self.period2 == 6:
+            self.axes1.set_xlabel('Fiscal Years Ago')
         else:
             print('Strange error (create_graphs)')
 
-        self.axes1.bar(dates, data, width=1, align='edge')
+        #no periods (no transactions yet): no bars, the default limits
+        if len(analysis) == 0:
+            self.bars1 = self.bars1_x = None
+            self.canvas1.draw_idle()
+            return
+
+        #a fixed set of bars, placed over the visible periods by layout_graph
+        bars = min(len(analysis), self.graph_max_bars + 4)
+        self.bars1 = self.axes1.bar(np.zeros(bars), np.zeros(bars), width=1, align='edge')
+        self.bars1_x = (self.period2, dates)
         self.axes1.axhline(y=0, linewidth=2, color='black')
 
-        self.axes1.set_xlim(left=len(analysis), right=0)
-        self.axes1.set_xticks(np.arange(len(analysis)))
+        self.axes1.set_xlim(left=dates.max() + 1, right=dates.min())
+        #few enough ticks to read, whatever the zoom (matplotlib is imported by now, see import_matplotlib)
+        from matplotlib.ticker import MaxNLocator
+        self.axes1.xaxis.set_major_locator(MaxNLocator(nbins='auto', integer=True))
         self.axes1.grid(True, which='both')
+        #the bars are placed again when zoomed or panned (clear() removes the callback)
+        self.axes1.callbacks.connect('xlim_changed', self.graph_xlim_changed)
+        self.update_graph_heights()
+
+    def update_graph_heights(self):
+        #a type was (un)checked or the totals changed: new heights for the same bars
+        if self.axes1 == None or self.bars1 == None:
+            return
+        self.graph_heights = self.graph_data()
         self.create_graph_ylabel()
-        self.canvas1.draw()
-            
+        self.set_graph_ylim(self.layout_graph())
+        self.canvas1.draw_idle()
+
+    def layout_graph(self):
+        #places the bars over the visible periods, one per period or the average of several when there are
+        #more than self.graph_max_bars, returns the heights shown
+        low, high = sorted(self.axes1.get_xlim())
+        starts, widths, heights = analytics.bucket_means(self.bars1_x[1], self.graph_heights, low, high, self.graph_max_bars)
+        starts, widths, heights = starts.tolist(), widths.tolist(), heights.tolist()
+        for n, bar in enumerate(self.bars1):
+            if n < len(starts):
+                bar.set_x(starts[n])
+                bar.set_width(widths[n])
+                bar.set_height(heights[n])
+                bar.set_visible(True)
+            else:
+                bar.set_visible(False)
+        return np.array(heights)
+
+    def graph_xlim_changed(self, axes):
+        #zoom/pan of the toolbar, it redraws afterwards
+        self.layout_graph()
+
+    def set_graph_ylim(self, data):
+        #what relim/autoscale_view would give (the bars and 0, 5% margins), without going through every bar
+        low, high = min(0, float(data.min(initial=0))), max(0, float(data.max(initial=0)))
+        margin = (high - low) * 0.05 if high > low else 1
+        self.axes1.set_ylim(low - margin, high + margin)
+
+    def graph_mask(self):
+        #1 for the checked types
+        return np.array([self.check_var1.get(), self.check_var2.get(), self.check_var3.get(), self.check_var4.get(),
+                         self.check_var5.get()], dtype=np.int64)
+
+    def graph_data(self):
+        #bar height (sum of the checked types) of every period, from the totals of the analysis
+        if self.period_totals == None:
+            return np.zeros(0)
+        return self.period_totals.get_totals() @ self.graph_mask() / 100
+
     def create_graph_ylabel(self):
         c = (self.check_var1.get(), self.check_var2.get(), self.check_var3.get(), self.check_var4.get(), self.check_var5.get())
         dict1 = {0:'Needed Expenses', 1:'Extra Expenses', 2:'Income', 3:'Special Expenses', 4:'Bonuses'}
@@ -934,6 +1268,69 @@ class App(tk.Tk):
         else:
             self.axes1.set_ylabel('zzzzzzzzzzzzzzzzzzzz')
 
+    def get_name_totals(self, normalized):
+        #analytics.NameTotals of self.transactions in self.period2, kept in self.analysis_cache until the transactions
+        #or their periods change
+        if self.period_totals == None:
+            return None
+        key = ('names', self.period2, normalized)
+        name_totals = self.analysis_cache.get(key, self.version)
+        if name_totals == None or name_totals.get_key_range() != self.period_totals.get_key_range():
+            name_totals = analytics.NameTotals(self.transactions, self.period2, normalized)
+            self.analysis_cache.put(key, self.version, name_totals, name_totals.get_size())
+        return name_totals
+
+    def update_name_tabs(self):
+        #the Descriptions/Trends tab is drawn again if it is on screen, else when it is shown (change_tab)
+        if self.notebook.select() == str(self.names_frame):
+            self.show_top_names()
+        elif self.notebook.select() == str(self.trend_frame):
+            self.show_trend()
+
+    def show_top_names(self):
+        self.treeview4.delete(*self.treeview4.get_children())
+        name_totals = self.get_name_totals(self.cb_group4.current() == 1)
+        if name_totals == None:
+            return
+        groups = name_totals.get_groups()
+        top, cents = name_totals.top(self.top_names)
+        amounts = formatting.currency_column(cents.reshape(-1) / 100)
+        top = top.tolist()
+        for n, (ago, period) in enumerate(name_totals.labels()):
+            values = [ago, period]
+            for m, group in enumerate(top[n]):
+                values.append('' if group < 0 else '{}  {}'.format(groups[group], amounts[len(top[n]) * n + m]))
+            self.treeview4.insert('', 'end', iid=period.replace(' ', ''), tags=['font'], values=values)
+        self.treeview4.yview('moveto', 0)
+        self.treeview4.see(self.treeview4.get_children()[-1])
+
+    def show_trend(self):
+        self.treeview5.delete(*self.treeview5.get_children())
+        name_totals = self.get_name_totals(self.cb_group5.current() == 1)
+        if name_totals == None:
+            self.cb_trend.config(values=[])
+            return
+        groups = name_totals.get_groups()
+        ranked = [groups[i] for i in name_totals.ranked_groups()]
+        self.cb_trend.config(values=ranked)
+        if len(ranked) == 0:
+            return
+        if self.cb_trend.get() not in ranked:
+            self.cb_trend.current(0)
+        cents = name_totals.trend(groups.index(self.cb_trend.get()))
+        #change from the period before, mean of the last 4 periods
+        change = np.diff(cents, prepend=0)
+        sums = np.cumsum(np.concatenate(([0], cents)))
+        counts = np.minimum(np.arange(1, len(cents) + 1), 4)
+        means = (sums[1:] - sums[np.maximum(np.arange(1, len(cents) + 1) - 4, 0)]) / counts
+        strs = formatting.currency_column(np.concatenate((cents, change, means)) / 100)
+        n = len(cents)
+        for i, (ago, period) in enumerate(name_totals.labels()):
+            self.treeview5.insert('', 'end', iid=period.replace(' ', ''), tags=['font'],
+                                  values=[ago, period, strs[i], strs[n + i] if i > 0 else '', strs[2 * n + i]])
+        self.treeview5.yview('moveto', 0)
+        self.treeview5.see(self.treeview5.get_children()[-1])
+
     def set_average_start_end(self, analysis):
         min_ago = analysis[-1]['ago']
         max_ago = analysis[0]['ago']
@@ -947,74 +1344,75 @@ class App(tk.Tk):
         if combobox_num == 1:
             index = self.cb_average1.current()
             strvar = self.average_text1
+            stats_strvar = self.stats_text1
         elif combobox_num == 2:
             index = self.cb_average2.current()
             strvar = self.average_text2
+            stats_strvar = self.stats_text2
         else:
             raise TypeError('Strange error (set_average_text)')
         
         #NONE
-        if index == 0:
+        if index == 0 or self.period_totals == None:
             strvar.set('Select an option')
+            stats_strvar.set('')
         else:
-            start_index = self.cb_start.current()
-            end_index = self.cb_end.current()
-            if start_index > end_index:
-                start_index, end_index = end_index, start_index
-            list_ = []
-            #Needed
-            if index == 1:
-                for dict_ in analysis[len(analysis) - end_index - 1:len(analysis) - start_index]:
-                    list_.append(dict_[1])
-            #Extra
-            elif index == 2:
-                for dict_ in analysis[len(analysis) - end_index - 1:len(analysis) - start_index]:
-                    list_.append(dict_[2])
-            #Income
-            elif index == 3:
-                for dict_ in analysis[len(analysis) - end_index - 1:len(analysis) - start_index]:
-                    list_.append(dict_[3])
-            #Special
-            elif index == 4:
-                for dict_ in analysis[len(analysis) - end_index - 1:len(analysis) - start_index]:
-                    list_.append(dict_[4])
-            #Bonus
-            elif index == 5:
-                for dict_ in analysis[len(analysis) - end_index - 1:len(analysis) - start_index]:
-                    list_.append(dict_[5])
-            #Essentials
-            elif index == 6:
-                for dict_ in analysis[len(analysis) - end_index - 1:len(analysis) - start_index]:
-                    list_.append(dict_[1] + dict_[3])
-            #Plus Extras
-            elif index == 7:
-                for dict_ in analysis[len(analysis) - end_index - 1:len(analysis) - start_index]:
-                    list_.append(dict_[1] + dict_[2] + dict_[3])
-            #Net
-            elif index == 8:
-                for dict_ in analysis[len(analysis) - end_index - 1:len(analysis) - start_index]:
-                    list_.append(dict_[1] + dict_[2] + dict_[3] + dict_[4] + dict_[5])
+            #cb_start/cb_end are counted from the last period ('* ago')
+            #prefix sums of self.period_totals, made once per analysis
+            stats = self.period_totals.get_range_stats()
+            start, end = self.cb_start.current(), self.cb_end.current()
+            strvar.set(self.currency(stats.mean(index, start, end)))
+            stats_strvar.set('median {}  std {}  min {}  max {}'.format(*formatting.currency_column(
+                [stats.median(index, start, end), stats.std(index, start, end), stats.min(index, start, end), stats.max(index, start, end)])))
+
+
+    #'transaction' is the transaction that is created (sign 1) or deleted (sign -1)
+    #only the period of the transaction is updated, unless the range of periods changed
+    def refresh_analysis(self, transaction, sign=1):
+        #the daily totals follow the transactions
+        if self.daily_totals != None:
+            if len(self.transactions) == 0:
+                self.daily_totals = None
             else:
-                raise TypeError('Strange error2 (set_average_text)')
-            
-            mean = np.mean(list_)
-            strvar.set(self.currency(mean))
-
-
-    #'transaction' is the transaction that is created or deleted
-    def refresh_analysis(self, analysis, transaction=None):
-        self.init_analysis()
+                self.daily_totals.apply(transaction, sign)
+                self.daily_totals.trim(self.transactions.get_date(0), self.transactions.get_date(-1))
+        #the totals of the descriptions of the version before this change (transactions_changed) are carried over,
+        #the ones that cannot be updated are made again when needed
+        for period2 in analytics.PERIODS:
+            for normalized in (False, True):
+                key = ('names', period2, normalized)
+                name_totals = self.analysis_cache.get(key, self.version - 1)
+                if name_totals != None and name_totals.apply(transaction, sign) != None:
+                    self.analysis_cache.put(key, self.version, name_totals, name_totals.get_size())
+
+        #an analysis from the worker is on its way (without this transaction), start it again
+        if self.worker.is_pending('analysis'):
+            self.start_analysis(self.analysis_done_text)
+            return
+        index = None
+        if self.period_totals != None and len(self.transactions) > 0:
+            key_range = (analytics.period_key(self.transactions.get_date(0), self.period2),
+                         analytics.period_key(self.transactions.get_date(-1), self.period2))
+            if key_range == self.period_totals.get_key_range():
+                index = self.period_totals.apply(transaction, sign)
+
+        if index == None:
+            self.init_analysis()
+        else:
+            a = self.period_totals.row(index)
+            self.analysis[index] = a
+            self.remember_analysis()
+            values2, values3 = self.analysis_values(a)
+            self.treeview2.item(a['period'].replace(' ', ''), values=values2)
+            self.treeview3.item(a['period'].replace(' ', ''), values=values3)
+            self.update_graph_heights()
+            self.set_average_text(self.analysis, 1)
+            self.set_average_text(self.analysis, 2)
+            self.update_name_tabs()
         
-        if transaction != None:
-            if self.period2 == 1:
-                changed = self.convert_date_str(transaction.get_date() - dt.timedelta(days=transaction.get_date().weekday()))
-            elif self.period2 == 2:
-                changed = self.month_name(transaction.get_date().month) + str(transaction.get_date().year)
-            elif self.period2 == 3:
-                changed = 'Q{}{}'.format(math.ceil(transaction.get_date().month / 3), transaction.get_date().year)
-            elif self.period2 == 4:
-                changed = str(transaction.get_date().year)
-
+        if len(self.transactions) > 0:
+            key = analytics.period_key(transaction.get_date(), self.period2)
+            changed = analytics.period_name(key, self.period2).replace(' ', '')
             if changed in self.treeview2.get_children():
                 self.select_line(self.treeview2, changed)
                 self.select_line(self.treeview3, changed)
@@ -1024,11 +1422,15 @@ class App(tk.Tk):
         #gets and checks entries
         valid = True
         valid_except_date = False
-        if self.e_amount.get() == '' and self.e_name.get() == '' and self.e_type.get() == '':
+        if self.loading:
+            self.info_text.set('Still loading...')
+        elif self.e_amount.get() == '' and self.e_name.get() == '' and self.e_type.get() == '':
             self.info_text.set('Empty entries...')
         else:
             try:
                 amount = float(self.e_amount.get())
+                #finite and within the columns of the store
+                transaction.to_cents(amount)
             except:
                 valid = False
             name = self.e_name.get()
@@ -1052,171 +1454,56 @@ class App(tk.Tk):
                     self.e_type.delete(0, 'end')
                     t = transaction.Transaction(amount, name, type_, date)
                     
+                    #the period of the transaction has to be filled in before the transaction is added
+                    if self.period in [1, 2, 3]:
+                        self.populate_period(self.period_iid(t.get_date()))
                     #insert into self.transactions according to date
-                    inserted = False
-                    temp_list = self.transactions[:]
-                    #if self.transactions is empty:
-                    if len(self.transactions) == 0:
-                        self.transactions.insert(0, t)
-                        inserted = True
-                    #if self.transactions is not empty:
-                    while not inserted:
-                        if t.get_date() >= temp_list[-1].get_date():
-                            self.transactions.insert(len(temp_list), t)
-                            inserted = True
-                        else:
-                            temp_list.pop()
-                            if len(temp_list) == 0:
-                                self.transactions.insert(0, t)
-                                inserted = True
+                    #added to the selected ledger, or the first file
+                    ledger = 0 if self.ledger == None else self.ledger
+                    index = self.transactions.insert_sorted(t, ledger)
+                    if self.transactions is not self.all_transactions:
+                        self.all_transactions.insert_sorted(t, ledger)
+                    self.transactions_changed()
 
                     #check for different periods to display
+                    if self.filter_query != None:
+                        self.add_to_results(index, t)
                     #if self.transactions is empty:
-                    if len(self.treeview.get_children()) == 0:
+                    elif len(self.treeview.get_children()) == 0:
                         i = self.t_to_screen_newperiod(t, 0)
                         self.select_line(self.treeview, i[1])
                     else:
                         #days
                         if self.period == 0:
-                            i = self.t_to_screen('', t, index=len(temp_list))
-                            self.select_line(self.treeview, i)
-
-                        #weeks
-                        elif self.period == 1:
-                            temp_item = self.treeview.get_children()[-1]
-                            got_item = False
-                            inserted = False
-                            while not got_item:
-                                #if newer period
-                                if t.get_date() >= self.convert_date_str(temp_item) + dt.timedelta(days=7):
-                                    i = self.t_to_screen_newperiod(t, index=self.treeview.index(temp_item) + 1)
-                                    got_item = True
-                                    inserted = True
-                                    #show both period and transaction on screen
-                                    self.treeview.see(i[0])
-                                    self.select_line(self.treeview, i[1])
-                                #if older period, go back one period
-                                elif t.get_date() < self.convert_date_str(temp_item):
-                                    temp_item = self.treeview.prev(temp_item)
-                                    if temp_item == '':
-                                        i = self.t_to_screen_newperiod(t, index=0)
-                                        got_item = True
-                                        inserted = True
-                                        self.treeview.see(i[0])
-                                        self.select_line(self.treeview, i[1])
-                                #otherwise, insert transaction in current period
-                                else:
-                                    i = temp_item
-                                    got_item = True
-                            if not inserted:
-                                temp_transaction = self.treeview.get_children(i)[-1]
-                                while not inserted:
-                                    if t.get_date() >= self.convert_date_str(self.treeview.set(temp_transaction, column=4)):
-                                        i2 = self.t_to_screen(i, t, index=self.treeview.index(temp_transaction) + 1)
-                                        inserted = True
-                                        self.treeview.see(i)
-                                        self.select_line(self.treeview, i2)
-
-                                    else:
-                                        temp_transaction = self.treeview.prev(temp_transaction)
-                                        if temp_transaction == '':
-                                            i2 = self.t_to_screen(i, t, index=0)
-                                            inserted = True
-                                            self.treeview.see(i)
-                                            self.select_line(self.treeview, i2)
-
-                        #months
-                        elif self.period == 2:
-                            temp_item = self.treeview.get_children()[-1]
-                            got_item = False
-                            inserted = False
-                            while not got_item:
-                                #if newer period
-                                if t.get_date().year > int(temp_item[temp_item.index(',') + 1:]) or\
-                                (t.get_date().year == int(temp_item[temp_item.index(',') + 1:]) and t.get_date().month > int(temp_item[:temp_item.index(',')])):
-                                    i = self.t_to_screen_newperiod(t, index=self.treeview.index(temp_item) + 1)
-                                    got_item = True
-                                    inserted = True
-                                    #show both period and transaction on screen
-                                    self.treeview.see(i[0])
-                                    self.select_line(self.treeview, i[1])
-                                #if same period
-                                elif temp_item == str(t.get_date().month) + ',' + str(t.get_date().year):
-                                    i = temp_item
-                                    got_item = True
-                                #otherwise, go back one period
-                                else:
-                                    temp_item = self.treeview.prev(temp_item)
-                                    #if new transaction is ealiest
-                                    if temp_item == '':
-                                        i = self.t_to_screen_newperiod(t, index=0)
-                                        got_item = True
-                                        inserted = True
-                                        self.treeview.see(i[0])
-                                        self.select_line(self.treeview, i[1])
-                            if not inserted:
-                                temp_transaction = self.treeview.get_children(i)[-1]
-                                while not inserted:
-                                    if t.get_date() >= self.convert_date_str(self.treeview.set(temp_transaction, column=4)):
-                                        i2 = self.t_to_screen(i, t, index=self.treeview.index(temp_transaction) + 1)
-                                        inserted = True
-                                        self.treeview.see(i)
-                                        self.select_line(self.treeview, i2)
-                                    else:
-                                        temp_transaction = self.treeview.prev(temp_transaction)
-                                        if temp_transaction == '':
-                                            i2 = self.t_to_screen(i, t, index=0)
-                                            inserted = True
-                                            self.treeview.see(i)
-                                            self.select_line(self.treeview, i2)
-
-                        #quarters
-                        elif self.period == 3:
-                            temp_item = self.treeview.get_children()[-1]
-                            got_item = False
-                            inserted = False
-                            while not got_item:
-                                #if newer period
-                                if (t.get_date().month > int(temp_item[:temp_item.index(',')]) * 3 and t.get_date().year >= int(temp_item[temp_item.index(',') + 1:]))\
-                                   or t.get_date().year > int(temp_item[temp_item.index(',') + 1:]):
-                                    i = self.t_to_screen_newperiod(t, index=self.treeview.index(temp_item) + 1)
-                                    got_item = True
-                                    inserted = True
-                                    #show both period and transaction on screen
-                                    self.treeview.see(i[0])
-                                    self.select_line(self.treeview, i[1])
-                                #if older period, go back one period
-                                elif (t.get_date().month < int(temp_item[:temp_item.index(',')]) * 3 - 2 and t.get_date().year <= int(temp_item[temp_item.index(',') + 1:]))\
-                                   or t.get_date().year < int(temp_item[temp_item.index(',') + 1:]):
-                                    temp_item = self.treeview.prev(temp_item)
-                                    if temp_item == '':
-                                        i = self.t_to_screen_newperiod(t, index=0)
-                                        got_item = True
-                                        inserted = True
-                                        self.treeview.see(i[0])
-                                        self.select_line(self.treeview, i[1])
-                                #otherwise, insert transaction in current period
-                                else:
-                                    i = temp_item
-                                    got_item = True
-                            if not inserted:
-                                temp_transaction = self.treeview.get_children(i)[-1]
-                                while not inserted:
-                                    if t.get_date() >= self.convert_date_str(self.treeview.set(temp_transaction, column=4)):
-                                        i2 = self.t_to_screen(i, t, index=self.treeview.index(temp_transaction) + 1)
-                                        inserted = True
-                                        self.treeview.see(i)
-                                        self.select_line(self.treeview, i2)
-                                    else:
-                                        temp_transaction = self.treeview.prev(temp_transaction)
-                                        if temp_transaction == '':
-                                            i2 = self.t_to_screen(i, t, index=0)
-                                            inserted = True
-                                            self.treeview.see(i)
-                                            self.select_line(self.treeview, i2)
-                    self.refresh_analysis(self.analysis, t)
+                            if index < self.day_start:
+                                #before the transactions shown
+                                self.day_start += 1
+                            else:
+                                i = self.t_to_screen('', t, index=index - self.day_start + int(self.day_start > 0))
+                                self.select_line(self.treeview, i)
+
+                        #weeks/months/quarters
+                        elif self.period in [1, 2, 3]:
+                            key = analytics.period_key(t.get_date(), self.period)
+                            #existing period, the transactions of a period are in the same order as in self.transactions
+                            if key in self.period_items:
+                                i = self.period_items[key]
+                                start = self.transactions.bisect(analytics.key_to_date(key, self.period) - dt.timedelta(days=1))
+                                i2 = self.t_to_screen(i, t, index=index - start)
+                                self.treeview.see(i)
+                                self.select_line(self.treeview, i2)
+                            #new period
+                            else:
+                                i = self.t_to_screen_newperiod(t, index=bisect.bisect(self.period_item_keys, key))
+                                #show both period and transaction on screen
+                                self.treeview.see(i[0])
+                                self.select_line(self.treeview, i[1])
+                    #the storage first, its totals (storage.TotalsCache) can be used by refresh_analysis
+                    if ledger < len(self.backends):
+                        self.backends[ledger].record_add(t)
+                    self.refresh_analysis(t, 1)
                     self.info_text.set('Added: "{}", {} ({}) -- {}'.format(t.get_name(), self.currency(t.get_amount()), t.get_typestr(),
-                                                                           self.convert_date_str(t.get_date()) + ' (' + self.weekday_name(t.get_date().weekday()) + ')'))
+                                                                           formatting.date_label(t.get_date())))
                     self.changed = True
             else:
                 #delete entries
@@ -1229,37 +1516,66 @@ class App(tk.Tk):
     def t_to_screen(self, parent, t, index='end'):
         #puts a transaction to screen in ordinary format
         str_amount = self.currency(t.get_amount())
-        date_str = self.convert_date_str(t.get_date()) + ' (' + self.weekday_name(t.get_date().weekday()) + ')'
+        date_str = formatting.date_label(t.get_date())
         i = self.treeview.insert(parent, index, values=[str_amount, t.get_name(), t.get_typestr(), date_str], tags=['font'])
         return i
 
+    def rows_to_screen(self, parent, start, end, index='end'):
+        #puts the transactions start to end - 1 of self.transactions to screen (in order from index), same format as t_to_screen
+        self.indexes_to_screen(parent, slice(start, end), index)
+
+    def indexes_to_screen(self, parent, rows, index='end'):
+        #same as rows_to_screen, rows is a slice or an array of indexes of self.transactions
+        amounts = formatting.currency_column(self.transactions.get_amounts()[rows] / 100)
+        names = self.transactions.get_names()
+        name_ids = self.transactions.get_name_ids()[rows].tolist()
+        types = self.transactions.get_types()[rows].tolist()
+        dates = self.transactions.get_dates()[rows].tolist()
+        for n in range(len(name_ids)):
+            values = [amounts[n], names[name_ids[n]], transaction.type_to_text(types[n]), formatting.date_label(dates[n])]
+            self.treeview.insert(parent, index if index == 'end' else index + n, values=values, tags=['font'])
+
     def t_to_screen_newperiod(self, t, index='end'):
         #index is index of the period item, not the transaction
         if self.period == 0:
             i = self.t_to_screen('' , t, index=index)
             return None, i
-        elif self.period == 1:
-            dict_ = {0:[0, 6], 1:[1, 5], 2:[2, 4], 3:[3, 3], 4:[4, 2], 5:[5, 1], 6:[6, 0]}
-            #iid is the date of the monday in the week (eg. 20/4/2016)
-            i = self.treeview.insert('', index, iid=self.convert_date_str(t.get_date() - dt.timedelta(days=dict_[t.get_date().weekday()][0])), tags=['font2'],
-                                     values=['Week:', self.convert_date_str(t.get_date() - dt.timedelta(days=dict_[t.get_date().weekday()][0]))
-                                             + '-' + self.convert_date_str(t.get_date() + dt.timedelta(days=dict_[t.get_date().weekday()][1]))])
+        else:
+            i = self.period_to_screen(t.get_date(), index=index)
             i2 = self.t_to_screen(i, t, index='end')
             return i, i2
+
+    def period_iid(self, date):
+        #iid of the period item containing date
+        if self.period == 1:
+            #the date of the monday in the week (eg. 20/04/2016)
+            return self.convert_date_str(date - dt.timedelta(days=date.weekday()))
         elif self.period == 2:
-            #iid is the month and year (eg. 2,2015)
-            i = self.treeview.insert('', index, iid=str(t.get_date().month) + ',' + str(t.get_date().year), tags=['font2'],
-                                     values=['Month:', self.month_name(t.get_date().month, option='full') + ' ' + str(t.get_date().year)])
-            i2 = self.t_to_screen(i, t, index='end')
-            return i, i2
+            #the month and year (eg. 2,2015)
+            return str(date.month) + ',' + str(date.year)
+        elif self.period == 3:
+            #the quarter and year (eg. 4,2017)
+            return str(math.ceil(date.month / 3)) + ',' + str(date.year)
+
+    def period_to_screen(self, date, index='end'):
+        #puts the (empty) period item containing date to screen, and adds it to the period index
+        if self.period == 1:
+            dict_ = {0:[0, 6], 1:[1, 5], 2:[2, 4], 3:[3, 3], 4:[4, 2], 5:[5, 1], 6:[6, 0]}
+            i = self.treeview.insert('', index, iid=self.period_iid(date), tags=['font2'],
+                                     values=['Week:', self.convert_date_str(date - dt.timedelta(days=dict_[date.weekday()][0]))
+                                             + '-' + self.convert_date_str(date + dt.timedelta(days=dict_[date.weekday()][1]))])
+        elif self.period == 2:
+            i = self.treeview.insert('', index, iid=self.period_iid(date), tags=['font2'],
+                                     values=['Month:', self.month_name(date.month, option='full') + ' ' + str(date.year)])
         elif self.period == 3:
             dict_ = {1:[1, 2, 3], 2:[4, 5, 6], 3:[7, 8, 9], 4:[10, 11, 12], None:[None]}
-            quarter, year = math.ceil(t.get_date().month / 3), t.get_date().year
-            #iid is the quarter and year (eg. 4,2017)
-            i = self.treeview.insert('', index, iid=str(quarter) + ',' + str(year), values=['Months:', self.month_name(dict_[quarter][0], option='full') + ' - ' +
+            quarter, year = math.ceil(date.month / 3), date.year
+            i = self.treeview.insert('', index, iid=self.period_iid(date), values=['Months:', self.month_name(dict_[quarter][0], option='full') + ' - ' +
                                                        self.month_name(dict_[quarter][2]) + ' ' + str(year)], tags=['font2'])
-            i2 = self.t_to_screen(i, t, index='end')
-            return i, i2
+        key = analytics.period_key(date, self.period)
+        self.period_items[key] = i
+        bisect.insort(self.period_item_keys, key)
+        return i
         
     def select_line(self, treeview, item):
         treeview.selection_set(item)
@@ -1268,22 +1584,36 @@ class App(tk.Tk):
         treeview.see(item)
 
     def delete_last(self):
-        if len(self.treeview.get_children()) == 0:
+        if self.loading:
+            self.info_text.set('Still loading...')
+        elif len(self.transactions) == 0:
             self.info_text.set('Nothing to delete...')
         else:
+            ledger = self.transactions.get_ledger(-1)
             t = self.transactions.pop()
-            if self.period == 0:
+            if self.transactions is not self.all_transactions:
+                #the last row of the ledger, the rows of a ledger are in the same order in both
+                self.all_transactions.pop(int(np.flatnonzero(self.all_transactions.get_ledgers() == ledger)[-1]))
+            self.transactions_changed()
+            if self.filter_query != None:
+                self.delete_from_results(len(self.transactions))
+                self.info_text.set('Removed: \"{}\", {} ({}) -- {}'.format(t.get_name(), self.currency(t.get_amount()), t.get_typestr(),
+                                                                      formatting.date_label(t.get_date())))
+            elif self.period == 0:
                 to_delete = self.treeview.get_children()[-1]
                 amount = self.treeview.set(to_delete, column=1)
                 name = self.treeview.set(to_delete, column=2)
                 type_ = self.treeview.set(to_delete, column=3)
                 date = self.treeview.set(to_delete, column=4)
                 self.treeview.delete(to_delete)
+                if self.treeview.get_children() == ('earlier',):
+                    self.show_earlier_days(self.day_start)
                 if len(self.treeview.get_children()) > 0:
                     self.select_line(self.treeview, self.treeview.get_children()[-1])
                 self.info_text.set('Removed: \"{}\", {} ({}) -- {}'.format(name, amount ,type_, date))
             
-            if self.period in [1, 2, 3]:
+            elif self.period in [1, 2, 3]:
+                self.populate_period(self.treeview.get_children()[-1])
                 to_delete = self.treeview.get_children(self.treeview.get_children()[-1])[-1]
                 amount = self.treeview.set(to_delete, column=1)
                 name = self.treeview.set(to_delete, column=2)
@@ -1295,22 +1625,27 @@ class App(tk.Tk):
                     self.select_line(self.treeview, self.treeview.get_children(self.treeview.get_children()[-1])[-1])
                 elif len(self.treeview.get_children(self.treeview.get_children()[-1])) == 0:
                     self.treeview.delete(self.treeview.get_children()[-1])
+                    del self.period_items[self.period_item_keys.pop()]
                     if len(self.treeview.get_children()) > 0:
+                        self.populate_period(self.treeview.get_children()[-1])
                         self.select_line(self.treeview, self.treeview.get_children(self.treeview.get_children()[-1])[-1])
                 else:
                     print('Strange error (delete_last)')
             
-            self.refresh_analysis(self.analysis, t)
+            if ledger < len(self.backends):
+                self.backends[ledger].record_delete(t)
+            self.refresh_analysis(t, -1)
             self.changed = True
                 
     def show_hide_all(self):
-        if self.period in [1, 2, 3] and len(self.treeview.get_children()) > 0:
+        if self.filter_query == None and self.period in [1, 2, 3] and len(self.treeview.get_children()) > 0:
             show = False
             for child in self.treeview.get_children():
                 if self.treeview.item(child, option='open') == False:
                     show = True
             if show == True:
                 for child in self.treeview.get_children():
+                    self.populate_period(child)
                     self.treeview.item(child, open=True)
                 self.treeview.yview('moveto', 0)
                 self.select_line(self.treeview, self.treeview.get_children(self.treeview.get_children()[-1])[-1])
@@ -1324,16 +1659,36 @@ class App(tk.Tk):
         
     '''MENU COMMANDS ----------------------------------------------------------'''
     def open_file(self):
-        print('Open file')
+        #one or more files, several are shown as one journal (ledgers)
+        filenames = filedialog.askopenfilenames(parent=self, title='Open',
+                                                filetypes=[('PACX files', '*.txt *.pacx *.db'), ('All files', '*')])
+        if len(filenames) == 0 or self.loading:
+            return
+        if self.changed and not messagebox.askokcancel('Open', 'Discard the changes that are not saved?'):
+            return
+        self.filenames = list(filenames)
+        self.filename = self.filenames[0]
+        self.set_title()
+        self.set_ledgers([], transaction.TransactionStore())
+        self.changed = False
+        self.show_file_contents()
+        self.init_analysis()
+        self.start_loading(self.filenames)
+
     def save_file(self):
-        if self.filename != None:
-            to_write = '[PACX save file]\n'
-            for t in self.transactions:
-                to_write += self.parse_transaction(t)
-            self.file = open(self.filename, 'w')
-            self.file.write(to_write)
-            self.file.close()
-            self.file = None
+        if self.loading:
+            self.info_text.set('Still loading...')
+        elif self.filename != None:
+            if len(self.backends) == 0:
+                self.backends = [storage.open_backend(self.filename)]
+                self.backends[0].save(self.all_transactions)
+            elif len(self.backends) == 1:
+                #only the changes are written
+                self.backends[0].commit(self.all_transactions)
+            else:
+                #each file gets the changes of its own ledger
+                for ledger, backend in enumerate(self.backends):
+                    backend.commit(ledgers.split(self.all_transactions, ledger))
             self.info_text.set('Saved')
             self.changed = False
         else:
@@ -1363,91 +1718,84 @@ class App(tk.Tk):
                          
     '''FUNCTIONS THAT ARE EXECUTED RIGHT AFTER MAINLOOP EXECUTES =================================================='''
     def after_func(self):
-        pass
+        if self.startup_times != None:
+            self.update_idletasks()
+            self.startup_mark('window drawn')
+            #else printed when the file is loaded (finish_job)
+            if not self.loading:
+                self.print_startup_times()
+
+    def startup_mark(self, step):
+        if self.startup_times != None:
+            self.startup_times.append((step, time.perf_counter()))
+
+    def print_startup_times(self):
+        #time of each step since the previous one, and since the start of the imports
+        start = self.startup_times[0][1]
+        print('Startup times (s)')
+        for (_, previous), (step, t) in zip(self.startup_times, self.startup_times[1:]):
+            print('{:<34}{:>8.3f}{:>8.3f}'.format(step, t - previous, t - start))
+        print('{} transactions, period {}, analysis period {}'.format(len(self.transactions), self.period, self.period2))
         
     '''USEFUL CONVERSIONS ==========================================================================================='''
     def weekday_name(self, num, option='short'):
-        dict1 = {0:'Mon', 1:'Tue', 2:'Wed', 3:'Thu', 4:'Fri', 5:'Sat', 6:'Sun'}
-        dict2 = {0:'Monday', 1:'Tuesday', 2:'Wednesday', 3:'Thursday', 4:'Friday', 5:'Saturday', 6:'Sunday'}
-        if option == 'short':
-            return dict1[num]
-        if option == 'full':
-            return dict2[num]
-        else:
-            raise ValueError('Wrong option (short or full)')
+        return formatting.weekday_name(num, option)
         
     def month_name(self, num, option='short'):
-        dict1 = {1:'Jan', 2:'Feb', 3:'Mar', 4:'Apr', 5:'May', 6:'Jun', 7:'Jul', 8:'Aug', 9:'Sep', 10:'Oct', 11:'Nov', 12:'Dec'}
-        dict2 = {1:'January', 2:'Febuary', 3:'March', 4:'April', 5:'May', 6:'June', 7:'July', 8:'August', 9:'September',
-                 10:'October', 11:'November', 12:'December'}
-        if option == 'short':
-            return dict1[num]
-        if option == 'full':
-            return dict2[num]
-        else:
-            raise ValueError('Wrong option (short or full)')
+        return formatting.month_name(num, option)
         
     def convert_date_str(self, date):
         #date is a datetime.date object or string
-        if isinstance(date, dt.date):
-            str_ = str(date)[8:] + '/' + str(date)[5:7] + '/' + str(date)[:4]
-            return str_
-        elif isinstance(date, str):
-            temp = date
-            day = int(temp[:temp.index('/')])
-            temp = temp[temp.index('/') + 1:]
-            month = int(temp[:temp.index('/')])
-            if temp.find(' (') == -1:
-                year = int(temp[temp.index('/') + 1:])
-            else:
-                year = int(temp[temp.index('/') + 1:temp.index(' (')])
-            d = dt.date(year, month, day)
-            return d
-        else:
-            raise TypeError('Wrong type! (convert_date_str)')
+        return formatting.convert_date_str(date)
 
     def currency(self, number):
-        if isinstance(number, (float, int)):
-            return locale.currency(number, symbol=False, grouping=True, international=False)
-        elif isinstance(number, str):
-            return locale.currency(float(number), symbol=False, grouping=True, international=False)
-        else:
-            raise TypeError('Wrong type (currency)')
-    
-    def parse_txt_file(self, string):
-        if string[:3] == 't//':
-            string = string[3:]
-            amount = float(string[:string.index(',,,')])
-            string = string[string.index(',,,') + 3:]
-            name = string[:string.index(',,,')]
-            string = string[string.index(',,,') + 3:]
-            type_ = int(string[:string.index(',,,')])
-            string = string[string.index(',,,') + 3:]
-
-            year = int(str(string[:string.index('-')]))
-            string = string[string.index('-') + 1:]
-            month = int(str(string[:string.index('-')]))
-            string = string[string.index('-') + 1:]
-            day = int(string)
-            date = dt.date(year, month, day)
-            
-            return(transaction.Transaction(amount, name, type_, date))
-        else:
-            raise TypeError('Line in txt file is not a transaction object')
-
-    def parse_transaction(self, t):
-        amount = str(t.get_amount())
-        name = t.get_name()
-        type_ = str(t.get_type())
-        date = str(t.get_date())
-        string = 't//{},,,{},,,{},,,{}\n'.format(amount, name, type_, date)
-        return string
+        return formatting.currency(number)
+
+#jobs of the worker thread, progress(text) shows what is being done (see worker.Worker.submit)
+#it is also called within the slow steps (rows done), where a cancelled job stops
+def load_job(progress, filenames, period2):
+    if len(filenames) == 1:
+        text = 'Loading "{}"'.format(filenames[0])
+    else:
+        text = 'Loading {} files'.format(len(filenames))
+    progress(text)
+    loaded = ledgers.load(filenames, progress=lambda rows: progress('{} ({} transactions)'.format(text, rows)))
+    backends = [backend for backend, store in loaded]
+    if len(loaded) == 1:
+        store = loaded[0][1]
+    else:
+        progress('Merging {} files'.format(len(filenames)))
+        store = ledgers.merge([store for backend, store in loaded])
+    daily_totals = period_totals = None
+    if len(loaded) == 1 and len(store) > 0:
+        #read with the file (storage.TotalsCache)
+        period_totals = backends[0].cached_period_totals(period2)
+    if period_totals == None and len(store) > 0:
+        daily_totals = analytics.DailyTotals(store, analysis_progress(progress, store))
+        period_totals = analytics.PeriodTotals(daily_totals, period2)
+    return backends, store, period2, daily_totals, period_totals
+
+def analysis_job(progress, store, period2, version):
+    #version of the transactions copied (App.version)
+    daily_totals = analytics.DailyTotals(store, analysis_progress(progress, store))
+    progress('Analysing {} transactions'.format(len(store)))
+    return period2, version, daily_totals, analytics.PeriodTotals(daily_totals, period2)
+
+def analysis_progress(progress, store):
+    #progress(rows done) of analytics.DailyTotals
+    return lambda rows: progress('Analysing {} transactions ({:.0%})'.format(len(store), rows / len(store)))
 
 def main():
-    filename = 'Boren Personal.txt'
-    app = App(filename=filename)
+    #python PACX.py [--profile-startup] [file ...], several files are opened as ledgers
+    args = sys.argv[1:]
+    profile_startup = '--profile-startup' in args
+    if profile_startup:
+        args.remove('--profile-startup')
+    filenames = args if len(args) > 0 else ['Boren Personal.txt']
+    app = App(filenames=filenames, profile_startup=profile_startup)
     app.mainloop()
     
     #make default file
 
-main()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,520 @@
+'''
+PACX analytics
+
+Grouping, per-period totals and averages of the transaction types, computed from the columns of a
+transaction.TransactionStore. Nothing here needs tkinter, so it can be used without the GUI, eg.
+
+store = savefile.load('Boren Personal.txt')
+analysis = analytics.aggregate(store, analytics.MONTH)
+print(analytics.average(analysis, analytics.NET, 0, 11))
+'''
+import re
+import collections
+import datetime as dt
+
+import numpy as np
+
+import transaction
+import formatting
+
+#analysis periods (same numbers as App.period2)
+WEEK, MONTH, QUARTER, YEAR, FORTNIGHT, FISCAL_YEAR = 1, 2, 3, 4, 5, 6
+PERIODS = (WEEK, MONTH, QUARTER, YEAR, FORTNIGHT, FISCAL_YEAR)
+#first month of the fiscal year (April in New Zealand), 1 makes it the calendar year
+FISCAL_YEAR_START = 4
+TYPES = (1, 2, 3, 4, 5)
+#averaged categories (same numbers as App.cb_average1/2), 1-5 are the types
+NEEDED, EXTRA, INCOME, SPECIAL, BONUSES, ESSENTIALS, PLUS_EXTRAS, NET = 1, 2, 3, 4, 5, 6, 7, 8
+CATEGORIES = {NEEDED:'Needed', EXTRA:'Extra', INCOME:'Income', SPECIAL:'Special', BONUSES:'Bonuses',
+              ESSENTIALS:'Essentials', PLUS_EXTRAS:'Plus Extras', NET:'Net'}
+#types added up in each category
+CATEGORY_TYPES = {NEEDED:(1,), EXTRA:(2,), INCOME:(3,), SPECIAL:(4,), BONUSES:(5,),
+                  ESSENTIALS:(1, 3), PLUS_EXTRAS:(1, 2, 3), NET:(1, 2, 3, 4, 5)}
+#(5 types, 8 categories) 0/1 matrix, per-type totals @ CATEGORY_MATRIX = per-category totals
+CATEGORY_MATRIX = np.array([[int(type_ in CATEGORY_TYPES[c]) for c in sorted(CATEGORIES)] for type_ in TYPES], dtype=np.int64)
+#memory of an AnalysisCache, and about the memory of one row of an analysis (a dictionary of analysis_row)
+ANALYSIS_CACHE_BYTES = 64 << 20
+ROW_BYTES = 600
+#about the memory of one group of a NameTotals (its list and table entries)
+GROUP_BYTES = 120
+#rows grouped at a time by DailyTotals, between them progress is called
+DAILY_CHUNK_ROWS = 1 << 18
+
+def period_keys(dates, period):
+    #integer key of each date's period, consecutive periods have consecutive keys
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if period == WEEK:
+        #1970-01-01 is a thursday, so weeks start on mondays
+        return (dates.astype(np.int64) + 3) // 7
+    elif period == MONTH:
+        return dates.astype('datetime64[M]').astype(np.int64)
+    elif period == QUARTER:
+        return dates.astype('datetime64[M]').astype(np.int64) // 3
+    elif period == YEAR:
+        return dates.astype('datetime64[Y]').astype(np.int64)
+    elif period == FORTNIGHT:
+        #pairs of weeks, from the week of 1970-01-01
+        return (dates.astype(np.int64) + 3) // 14
+    elif period == FISCAL_YEAR:
+        #key 0 starts in 1970
+        return (dates.astype('datetime64[M]').astype(np.int64) - (FISCAL_YEAR_START - 1)) // 12
+    else:
+        raise ValueError('Wrong period (period_keys)')
+
+def period_starts(dates, period):
+    #indexes of the first row of each period (dates sorted)
+    keys = period_keys(dates, period)
+    return np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1)).astype(np.int64)
+
+def period_key(date, period):
+    return int(period_keys(np.datetime64(date, 'D'), period))
+
+def key_to_date(key, period):
+    #first day of the period
+    if period == WEEK:
+        return (np.datetime64(0, 'D') + key * 7 - 3).item()
+    elif period == MONTH:
+        return np.datetime64(key, 'M').astype('datetime64[D]').item()
+    elif period == QUARTER:
+        return np.datetime64(key * 3, 'M').astype('datetime64[D]').item()
+    elif period == YEAR:
+        return np.datetime64(key, 'Y').astype('datetime64[D]').item()
+    elif period == FORTNIGHT:
+        return key_to_date(key * 2, WEEK)
+    elif period == FISCAL_YEAR:
+        return np.datetime64(key * 12 + FISCAL_YEAR_START - 1, 'M').astype('datetime64[D]').item()
+    else:
+        raise ValueError('Wrong period (key_to_date)')
+
+def period_name(key, period):
+    date = key_to_date(key, period)
+    if period == WEEK:
+        return formatting.convert_date_str(date)
+    elif period == MONTH:
+        return '{} {}'.format(formatting.month_name(date.month), date.year)
+    elif period == QUARTER:
+        return 'Q{} {}'.format((date.month + 2) // 3, date.year)
+    elif period == FORTNIGHT:
+        return formatting.convert_date_str(date)
+    elif period == FISCAL_YEAR and FISCAL_YEAR_START != 1:
+        #eg. 2017/18
+        return '{}/{:02d}'.format(date.year, (date.year + 1) % 100)
+    else:
+        return str(date.year)
+
+def period_totals(store, period):
+    #returns (first key, int64 array of cents with shape (periods, 5)), periods without transactions are zero
+    #store can also be a storage backend that works the totals out itself (eg. SQLite), or DailyTotals
+    if not isinstance(store, transaction.TransactionStore):
+        return store.period_totals(period)
+    if len(store) == 0:
+        return 0, np.zeros((0, len(TYPES)), dtype=np.int64)
+    keys = period_keys(store.get_dates(), period)
+    first_key = int(keys.min())
+    n = int(keys.max()) - first_key + 1
+    index = (keys - first_key) * len(TYPES) + store.get_types().astype(np.int64) - 1
+    sums = np.bincount(index, weights=store.get_amounts(), minlength=n * len(TYPES))
+    return first_key, np.rint(sums).astype(np.int64).reshape(n, len(TYPES))
+
+def analysis_rows(first_key, totals, period, today=None):
+    #list of {'ago', 'period', 1, 2, 3, 4, 5} dictionaries, one per period (what App.display_analysis uses)
+    if today is None:
+        today = dt.date.today()
+    ago = period_key(today, period) - first_key
+    rows = []
+    for i, sums in enumerate(totals.tolist()):
+        rows.append(analysis_row(first_key + i, sums, period, ago - i))
+    return rows
+
+def analysis_row(key, sums, period, ago):
+    row = {'ago': ago, 'period': period_name(key, period)}
+    for type_, cents in zip(TYPES, sums):
+        row[type_] = cents / 100
+    return row
+
+def period_labels(first_key, n, period, today=None):
+    #('* ago', period name) of n periods from first_key
+    if today is None:
+        today = dt.date.today()
+    ago = period_key(today, period) - first_key
+    return [(ago - i, period_name(first_key + i, period)) for i in range(n)]
+
+def aggregate(store, period, today=None):
+    first_key, totals = period_totals(store, period)
+    return analysis_rows(first_key, totals, period, today)
+
+def category_value(a, category):
+    #value of a category in one row of an analysis
+    return sum([a[type_] for type_ in CATEGORY_TYPES[category]])
+
+def range_values(analysis, category, start, end):
+    #category values of the periods from 'start' to 'end' periods before the last one (inclusive, either order)
+    if start > end:
+        start, end = end, start
+    return [category_value(a, category) for a in analysis[len(analysis) - end - 1:len(analysis) - start]]
+
+def average(analysis, category, start, end):
+    return np.mean(range_values(analysis, category, start, end))
+
+
+def bucket_means(positions, values, low, high, max_buckets):
+    #level of detail of a bar graph: the periods at integer positions (eg. '* ago') are put in buckets of equal size,
+    #so that at most about max_buckets cover the visible range low-high, returns (starts, widths, mean values)
+    #the buckets are aligned to multiples of their size, so they stay the same while panning
+    positions = np.asarray(positions, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(positions) != len(values):
+        raise ValueError('positions and values have different lengths (bucket_means)')
+    if len(positions) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    size = max(1, int(np.ceil((high - low) / max_buckets)))
+    #whole buckets, one more on each side so the edges are covered while panning
+    buckets = positions // size
+    keep = (buckets >= np.floor(low) // size - 1) & (buckets <= np.ceil(high) // size + 1)
+    buckets, inverse = np.unique(buckets[keep], return_inverse=True)
+    means = np.bincount(inverse, weights=values[keep], minlength=len(buckets)) / np.bincount(inverse, minlength=len(buckets))
+    #the first and last buckets only cover the periods there are
+    starts = np.maximum(buckets * size, positions.min())
+    ends = np.minimum(buckets * size + size, positions.max() + 1)
+    return starts, ends - starts, means
+
+
+class DailyTotals:
+
+    #the base of every period: totals per day and type as one dense (days, 5) array from the first to the last date,
+    #made from the transactions once, the totals of any period are sums of whole days of it (period_totals)
+    #it follows the changes of the transactions (apply/trim), so they never have to be grouped again
+    #progress(rows done) is called before each chunk of rows (eg. by a worker job, which can stop there)
+    def __init__(self, store, progress=None):
+        if len(store) == 0:
+            self.__first_day, self.__totals = 0, np.zeros((0, len(TYPES)), dtype=np.int64)
+            return
+        days = store.get_dates().astype(np.int64)
+        types = store.get_types().astype(np.int64)
+        amounts = store.get_amounts()
+        self.__first_day = int(days.min())
+        n = int(days.max()) - self.__first_day + 1
+        sums = np.zeros(n * len(TYPES))
+        for start in range(0, len(days), DAILY_CHUNK_ROWS):
+            if progress != None:
+                progress(start)
+            stop = start + DAILY_CHUNK_ROWS
+            index = (days[start:stop] - self.__first_day) * len(TYPES) + types[start:stop] - 1
+            sums += np.bincount(index, weights=amounts[start:stop], minlength=n * len(TYPES))
+        self.__totals = np.rint(sums).astype(np.int64).reshape(n, len(TYPES))
+
+    def __len__(self):
+        return len(self.__totals)
+
+    def copy(self):
+        daily_totals = DailyTotals.__new__(DailyTotals)
+        daily_totals.__first_day, daily_totals.__totals = self.__first_day, self.__totals.copy()
+        return daily_totals
+
+    def get_totals(self):
+        return self.__totals
+
+    #(first date, last date) covered
+    def get_date_range(self):
+        first = np.datetime64(self.__first_day, 'D')
+        return first.item(), (first + len(self.__totals) - 1).item()
+
+    #same as period_totals(store, period) of the transactions, without going through them
+    def period_totals(self, period):
+        if len(self.__totals) == 0:
+            return 0, np.zeros((0, len(TYPES)), dtype=np.int64)
+        keys = period_keys(np.datetime64(self.__first_day, 'D') + np.arange(len(self.__totals)), period)
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        return int(keys[0]), np.add.reduceat(self.__totals, starts, axis=0)
+
+    #adds (sign 1) or removes (sign -1) a transaction, days are added if its date is outside the ones covered
+    def apply(self, t, sign=1):
+        day = int(np.datetime64(t.get_date(), 'D').astype(np.int64))
+        if len(self.__totals) == 0:
+            self.__first_day = day
+        if day < self.__first_day:
+            self.__totals = np.concatenate((np.zeros((self.__first_day - day, len(TYPES)), dtype=np.int64), self.__totals))
+            self.__first_day = day
+        if day >= self.__first_day + len(self.__totals):
+            extra = day - self.__first_day - len(self.__totals) + 1
+            self.__totals = np.concatenate((self.__totals, np.zeros((extra, len(TYPES)), dtype=np.int64)))
+        self.__totals[day - self.__first_day, t.get_type() - 1] += sign * transaction.to_cents(t.get_amount())
+
+    #keeps only the days from first to last (datetime.date), eg. after the last transaction of a day was deleted
+    def trim(self, first, last):
+        start = int(np.datetime64(first, 'D').astype(np.int64)) - self.__first_day
+        end = int(np.datetime64(last, 'D').astype(np.int64)) - self.__first_day + 1
+        if start > 0 or end < len(self.__totals):
+            self.__totals = self.__totals[max(start, 0):max(end, 0)]
+            self.__first_day += max(start, 0)
+
+class RangeStats:
+
+    #statistics of each category over a range of periods, from the (periods, 5) cent totals of an analysis
+    #start and end count periods before the last one (inclusive, either order), as range_values
+    #the means and standard deviations come from prefix sums (O(1) per range), the rest from the category columns
+    def __init__(self, totals):
+        #(periods, 8) cents, column category - 1
+        self.__values = np.asarray(totals, dtype=np.int64) @ CATEGORY_MATRIX
+        self.__sums = np.zeros((len(self.__values) + 1, len(CATEGORIES)), dtype=np.int64)
+        np.cumsum(self.__values, axis=0, out=self.__sums[1:])
+        #float, squared cents can overflow int64
+        self.__squares = np.zeros(self.__sums.shape)
+        np.cumsum(self.__values.astype(np.float64) ** 2, axis=0, out=self.__squares[1:])
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __rows(self, start, end):
+        if start > end:
+            start, end = end, start
+        return max(len(self.__values) - end - 1, 0), len(self.__values) - start
+
+    def count(self, start, end):
+        low, high = self.__rows(start, end)
+        return max(high - low, 0)
+
+    def total(self, category, start, end):
+        low, high = self.__rows(start, end)
+        return int(self.__sums[high, category - 1] - self.__sums[low, category - 1]) / 100
+
+    def mean(self, category, start, end):
+        count = self.count(start, end)
+        if count == 0:
+            return float('nan')
+        return self.total(category, start, end) / count
+
+    def std(self, category, start, end):
+        #population standard deviation, as np.std
+        count = self.count(start, end)
+        if count == 0:
+            return float('nan')
+        low, high = self.__rows(start, end)
+        mean = (self.__sums[high, category - 1] - self.__sums[low, category - 1]) / count
+        square = (self.__squares[high, category - 1] - self.__squares[low, category - 1]) / count
+        return float(np.sqrt(max(square - mean * mean, 0))) / 100
+
+    def values(self, category, start, end):
+        #dollars of the periods in the range, oldest first
+        low, high = self.__rows(start, end)
+        return self.__values[low:high, category - 1] / 100
+
+    def median(self, category, start, end):
+        return float(np.median(self.values(category, start, end)))
+
+    def min(self, category, start, end):
+        return float(np.min(self.values(category, start, end)))
+
+    def max(self, category, start, end):
+        return float(np.max(self.values(category, start, end)))
+
+
+class PeriodTotals:
+
+    #running totals per period and type, so one added or deleted transaction only changes one period
+    def __init__(self, store, period):
+        self.__period = period
+        self.__first_key, self.__totals = period_totals(store, period)
+        #RangeStats of the totals, made when first needed
+        self.__range_stats = None
+
+    #from the result of period_totals (eg. read from storage.TotalsCache)
+    @classmethod
+    def from_totals(cls, period, first_key, totals):
+        period_totals = cls.__new__(cls)
+        period_totals.__period = period
+        period_totals.__first_key = int(first_key)
+        period_totals.__totals = np.array(totals, dtype=np.int64).reshape(-1, len(TYPES))
+        period_totals.__range_stats = None
+        return period_totals
+
+    def __len__(self):
+        return len(self.__totals)
+
+    #independent copy (both are changed by apply)
+    def copy(self):
+        return PeriodTotals.from_totals(self.__period, self.__first_key, self.__totals)
+
+    def get_period(self):
+        return self.__period
+
+    def get_first_key(self):
+        return self.__first_key
+
+    def get_totals(self):
+        return self.__totals
+
+    #(first key, last key) of the periods covered
+    def get_key_range(self):
+        return self.__first_key, self.__first_key + len(self.__totals) - 1
+
+    #adds (sign 1) or removes (sign -1) a transaction, returns the index of the changed period,
+    #or None if the date is outside the periods (then everything has to be recomputed)
+    def apply(self, t, sign=1):
+        index = period_key(t.get_date(), self.__period) - self.__first_key
+        if not 0 <= index < len(self.__totals):
+            return None
+        self.__totals[index, t.get_type() - 1] += sign * transaction.to_cents(t.get_amount())
+        self.__range_stats = None
+        return index
+
+    def get_range_stats(self):
+        if self.__range_stats == None:
+            self.__range_stats = RangeStats(self.__totals)
+        return self.__range_stats
+
+    def row(self, index, today=None):
+        if today is None:
+            today = dt.date.today()
+        key = self.__first_key + index
+        ago = period_key(today, self.__period) - key
+        return analysis_row(key, self.__totals[index].tolist(), self.__period, ago)
+
+    def rows(self, today=None):
+        return analysis_rows(self.__first_key, self.__totals, self.__period, today)
+
+class AnalysisCache:
+
+    #results worked out from the transactions (eg. the analysis of each period) for one version of them, the
+    #version is a counter increased on every change of the transactions (App.version), entries of an older version
+    #are never returned. The least recently used entries are dropped once they take more than max_bytes
+    def __init__(self, max_bytes=ANALYSIS_CACHE_BYTES):
+        #{key: (version, value, size in bytes)}, least recently used first
+        self.__entries = collections.OrderedDict()
+        self.__size = 0
+        self.__max_bytes = max_bytes
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get_size(self):
+        return self.__size
+
+    #value of key for version, None if there is none
+    def get(self, key, version):
+        if key not in self.__entries:
+            return None
+        if self.__entries[key][0] != version:
+            self.__remove(key)
+            return None
+        self.__entries.move_to_end(key)
+        return self.__entries[key][1]
+
+    def put(self, key, version, value, size):
+        if key in self.__entries:
+            self.__remove(key)
+        if size > self.__max_bytes:
+            return
+        self.__entries[key] = (version, value, size)
+        self.__size += size
+        while self.__size > self.__max_bytes:
+            self.__remove(next(iter(self.__entries)))
+
+    def clear(self):
+        self.__entries.clear()
+        self.__size = 0
+
+    def __remove(self, key):
+        self.__size -= self.__entries.pop(key)[2]
+
+def normalize_name(name):
+    #category of a description: lowercase, without the parts in brackets and after a comma
+    #eg. 'Mic (SM58)' -> 'mic', 'tickets, swan lake' -> 'tickets'
+    name = re.sub(r'\([^)]*\)?', ' ', name.lower()).split(',')[0]
+    return ' '.join(name.split())
+
+class NameTotals:
+
+    #totals per period and description (or category, normalize_name), for the top descriptions of each period and
+    #the trend of one. Only the (period, description) pairs with transactions are kept: their codes
+    #(period index * number of groups + group, sorted) and totals in cents, from one np.unique over the rows
+    def __init__(self, store, period, normalized=False):
+        self.__period = period
+        self.__normalized = normalized
+        names = store.get_names()
+        if normalized:
+            self.__groups = sorted(set(normalize_name(name) for name in names))
+        else:
+            self.__groups = list(names)
+        self.__group_table = {group: i for i, group in enumerate(self.__groups)}
+        #group of each name id of the store
+        group_ids = np.array([self.__group_table[self.group_of(name)] for name in names], dtype=np.int64)
+        self.__codes = np.zeros(0, dtype=np.int64)
+        self.__cents = np.zeros(0, dtype=np.int64)
+        if len(store) == 0:
+            self.__first_key, self.__periods = 0, 0
+            return
+        keys = period_keys(store.get_dates(), period)
+        self.__first_key = int(keys.min())
+        self.__periods = int(keys.max()) - self.__first_key + 1
+        codes = (keys - self.__first_key) * len(self.__groups) + group_ids[store.get_name_ids()]
+        self.__codes, inverse = np.unique(codes, return_inverse=True)
+        sums = np.bincount(inverse.reshape(-1), weights=store.get_amounts(), minlength=len(self.__codes))
+        self.__cents = np.rint(sums).astype(np.int64)
+
+    def __len__(self):
+        return self.__periods
+
+    def get_period(self):
+        return self.__period
+
+    def get_groups(self):
+        return self.__groups
+
+    def get_key_range(self):
+        return self.__first_key, self.__first_key + self.__periods - 1
+
+    def get_size(self):
+        #bytes taken (eg. for AnalysisCache)
+        return self.__codes.nbytes + self.__cents.nbytes + len(self.__groups) * GROUP_BYTES
+
+    def group_of(self, name):
+        return normalize_name(name) if self.__normalized else name
+
+    #as PeriodTotals.apply, None also for a description that is not in the totals yet
+    def apply(self, t, sign=1):
+        index = period_key(t.get_date(), self.__period) - self.__first_key
+        group = self.__group_table.get(self.group_of(t.get_name()))
+        if not 0 <= index < self.__periods or group == None:
+            return None
+        code = index * len(self.__groups) + group
+        position = int(np.searchsorted(self.__codes, code))
+        if position == len(self.__codes) or self.__codes[position] != code:
+            self.__codes = np.insert(self.__codes, position, code)
+            self.__cents = np.insert(self.__cents, position, 0)
+        self.__cents[position] += sign * transaction.to_cents(t.get_amount())
+        return index
+
+    def trend(self, group):
+        #cents of a group in each period
+        cents = np.zeros(self.__periods, dtype=np.int64)
+        mask = self.__codes % len(self.__groups) == group
+        cents[self.__codes[mask] // len(self.__groups)] = self.__cents[mask]
+        return cents
+
+    def top(self, n):
+        #(groups, cents), both (periods, n): the largest amounts (either sign) of each period, group -1 where there are
+        #fewer, the same amounts keep the order of the groups
+        n = min(n, len(self.__groups))
+        groups = np.full((self.__periods, n), -1, dtype=np.int64)
+        cents = np.zeros((self.__periods, n), dtype=np.int64)
+        keep = self.__cents != 0
+        codes, amounts = self.__codes[keep], self.__cents[keep]
+        periods, group_ids = np.divmod(codes, max(len(self.__groups), 1))
+        #by period, largest first
+        order = np.lexsort((-np.abs(amounts), periods))
+        periods, group_ids, amounts = periods[order], group_ids[order], amounts[order]
+        #place within the period
+        ranks = np.arange(len(periods)) - np.searchsorted(periods, periods)
+        top = ranks < n
+        groups[periods[top], ranks[top]] = group_ids[top]
+        cents[periods[top], ranks[top]] = amounts[top]
+        return groups, cents
+
+    def ranked_groups(self):
+        #indexes of the groups with transactions, largest total (either sign) first
+        size = np.bincount(self.__codes % max(len(self.__groups), 1), weights=np.abs(self.__cents), minlength=len(self.__groups))
+        return [int(i) for i in np.argsort(-size, kind='stable') if size[i] > 0]
+
+    def labels(self, today=None):
+        return period_labels(self.__first_key, self.__periods, self.__period, today)
@@ -0,0 +1,80 @@
+'''
+Benchmark of the strings of the transaction rows and the analysis tables
+
+Compares the cached dates and the column currency formatting of formatting.py with the previous per-call functions
+(dicts built on every call, str(date) slices, locale.currency) on the rows of a synthetic journal
+usage: python benchmarks/bench_formatting.py [rows ...]   (default 10000 100000)
+'''
+import sys
+import time
+import locale
+
+import synthetic
+import formatting
+
+def old_weekday_name(num, option='short'):
+    dict1 = {0:'Mon', 1:'Tue', 2:'Wed', 3:'Thu', 4:'Fri', 5:'Sat', 6:'Sun'}
+    dict2 = {0:'Monday', 1:'Tuesday', 2:'Wednesday', 3:'Thursday', 4:'Friday', 5:'Saturday', 6:'Sunday'}
+    if option == 'short':
+        return dict1[num]
+    if option == 'full':
+        return dict2[num]
+
+def old_convert_date_str(date):
+    return str(date)[8:] + '/' + str(date)[5:7] + '/' + str(date)[:4]
+
+def old_currency(number):
+    try:
+        return locale.currency(number, symbol=False, grouping=True, international=False)
+    except ValueError:
+        return '{:,.2f}'.format(number)
+
+def old_rows(store):
+    #as t_to_screen did it
+    rows = []
+    for t in store:
+        date = t.get_date()
+        rows.append([old_currency(t.get_amount()), t.get_name(), t.get_typestr(),
+                     old_convert_date_str(date) + ' (' + old_weekday_name(date.weekday()) + ')'])
+    return rows
+
+def new_rows(store):
+    #as rows_to_screen does it
+    amounts = formatting.currency_column(store.get_amounts() / 100)
+    names = store.get_names()
+    name_ids = store.get_name_ids().tolist()
+    types = store.get_types().tolist()
+    dates = store.get_dates().tolist()
+    return [[amounts[n], names[name_ids[n]], synthetic.transaction.type_to_text(types[n]), formatting.date_label(dates[n])]
+            for n in range(len(store))]
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def main(sizes):
+    for name in ('en_NZ.UTF-8', 'en_US.UTF-8', 'C.UTF-8'):
+        try:
+            formatting.set_locale(name)
+            break
+        except locale.Error:
+            pass
+    print('locale:', locale.setlocale(locale.LC_MONETARY))
+    for rows in sizes:
+        store = synthetic.make_store(rows)
+        old_time, old = timed(old_rows, store)
+        formatting.date_label.cache_clear()
+        new_time, new = timed(new_rows, store)
+        cached_time, _ = timed(new_rows, store)
+        amounts = (store.get_amounts() / 100).tolist()
+        old_currency_time, old_strs = timed(lambda: [old_currency(x) for x in amounts])
+        currency_time, strs = timed(lambda: [formatting.currency(x) for x in amounts])
+        column_time, column = timed(formatting.currency_column, amounts)
+        print('{:>8} rows   rows {:7.3f}s (cached dates {:7.3f}s, was {:7.3f}s)   same: {}'.format(
+            rows, new_time, cached_time, old_time, old == new))
+        print('{:>8} rows   currency column {:7.3f}s   per call {:7.3f}s (was {:7.3f}s)   same: {}'.format(
+            rows, column_time, currency_time, old_currency_time, old_strs == strs == column))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [10000, 100000])
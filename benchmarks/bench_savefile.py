@@ -0,0 +1,75 @@
+'''
+Benchmark of loading and saving the text save file
+
+Compares savefile.load_text/savefile.save_text with the previous readlines/index() parser and the to_write += writer,
+and times the binary format
+usage: python benchmarks/bench_savefile.py [lines ...]   (default 100000 1000000)
+'''
+import os
+import sys
+import time
+import tempfile
+import datetime as dt
+
+import synthetic
+import savefile
+import transaction
+
+def old_parse_txt_file(string):
+    string = string[3:]
+    amount = float(string[:string.index(',,,')])
+    string = string[string.index(',,,') + 3:]
+    name = string[:string.index(',,,')]
+    string = string[string.index(',,,') + 3:]
+    type_ = int(string[:string.index(',,,')])
+    string = string[string.index(',,,') + 3:]
+    year = int(str(string[:string.index('-')]))
+    string = string[string.index('-') + 1:]
+    month = int(str(string[:string.index('-')]))
+    string = string[string.index('-') + 1:]
+    day = int(string)
+    return transaction.Transaction(amount, name, type_, dt.date(year, month, day))
+
+def old_load(filename):
+    file = open(filename, 'r')
+    transactions = []
+    lines = file.readlines()
+    file.close()
+    for line in lines[1:]:
+        transactions += [old_parse_txt_file(line[:-1])]
+    transactions.sort(key=lambda t: t.get_date())
+    return transactions
+
+def old_save(filename, transactions):
+    to_write = '[PACX save file]\n'
+    for t in transactions:
+        to_write += 't//{},,,{},,,{},,,{}\n'.format(str(t.get_amount()), t.get_name(), str(t.get_type()), str(t.get_date()))
+    file = open(filename, 'w')
+    file.write(to_write)
+    file.close()
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as folder:
+        for lines in sizes:
+            filename = os.path.join(folder, 'journal {}.txt'.format(lines))
+            synthetic.write_journal(filename, lines)
+            old_load_time, transactions = timed(old_load, filename)
+            old_save_time, _ = timed(old_save, filename + '.old', transactions)
+            del transactions
+            load_time, store = timed(savefile.load_text, filename)
+            save_time, _ = timed(savefile.save_text, filename + '.new', store)
+            same = open(filename + '.old').read() == open(filename + '.new').read()
+            print('{:>9} lines   load {:7.3f}s (was {:7.3f}s)   save {:7.3f}s (was {:7.3f}s)   same output: {}'.format(
+                lines, load_time, old_load_time, save_time, old_save_time, same))
+            binary_save_time, _ = timed(savefile.save_binary, filename + '.pacx', store)
+            binary_load_time, binary_store = timed(savefile.load_binary, filename + '.pacx')
+            print('{:>9} lines   binary load {:7.3f}s   binary save {:7.3f}s'.format(lines, binary_load_time, binary_save_time))
+            del store, binary_store
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [100000, 1000000])
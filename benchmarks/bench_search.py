@@ -0,0 +1,33 @@
+'''
+Benchmark of the filter box (search.py)
+
+Times search.SearchIndex.find on a synthetic journal against a loop over the rows with search.Query.matches
+usage: python benchmarks/bench_search.py [rows ...]   (default 100000 1000000)
+'''
+import sys
+import time
+
+import synthetic
+import search
+
+QUERIES = ['groc', 'mic sm', '"rent"', 'type:1,2 amount:-50..0', 'date:2001..2002 wages', 'amount:..-100 t:1']
+
+def main(sizes):
+    for rows in sizes:
+        store = synthetic.make_store(rows)
+        index = search.SearchIndex(store)
+        for text in QUERIES:
+            query = search.parse(text)
+            start = time.perf_counter()
+            found = index.find(query)
+            find_time = time.perf_counter() - start
+            #the loop on every 10th row, scaled
+            start = time.perf_counter()
+            looped = [n for n in range(0, rows, 10) if query.matches(store[n])]
+            loop_time = (time.perf_counter() - start) * 10
+            same = looped == [n for n in found.tolist() if n % 10 == 0]
+            print('{:>9} rows   {:<26} {:>8} found   {:8.2f}ms (loop about {:8.0f}ms)   same: {}'.format(
+                rows, text, len(found), find_time * 1000, loop_time * 1000, same))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [100000, 1000000])
@@ -0,0 +1,51 @@
+'''
+Writes a synthetic PACX journal (benchmarks/synthetic.py)
+
+The format is chosen by the extension as in the GUI: ".db" SQLite, ".pacx" binary, anything else the text save file
+usage: python benchmarks/generate.py [-h] [--lines N] [--start YYYY-MM-DD] [--days N] [--mix N,N,N,N,N] [--seed N] FILE
+eg. python benchmarks/generate.py --lines 1000000 --days 3650 --mix 40,35,15,5,5 "big journal.pacx"
+'''
+import os
+import sys
+import argparse
+import datetime as dt
+
+import synthetic
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+
+def type_mix(text):
+    #'40,35,15,5,5': shares of the types 1-5
+    try:
+        mix = [float(x) for x in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('not a list of numbers: ' + text)
+    if len(mix) != 5 or min(mix) < 0 or sum(mix) <= 0:
+        raise argparse.ArgumentTypeError('needs 5 shares (types 1-5), not all 0: ' + text)
+    return mix
+
+def add_journal_arguments(parser):
+    #size, dates and types of the synthetic journal, also used by benchmarks/run.py
+    parser.add_argument('--lines', metavar='N', type=int, default=100000, help='number of transactions (default 100000)')
+    parser.add_argument('--start', metavar='YYYY-MM-DD', type=dt.date.fromisoformat, default=dt.date(2000, 1, 1),
+                        help='first date (default 2000-01-01)')
+    parser.add_argument('--days', metavar='N', type=int, help='number of days from the start (default lines / 4)')
+    parser.add_argument('--mix', metavar='N,N,N,N,N', type=type_mix,
+                        help='shares of the types 1-5 (default every description equally often)')
+    parser.add_argument('--seed', metavar='N', type=int, default=0, help='random seed (default 0)')
+
+def make_store(args):
+    return synthetic.make_store(args.lines, args.start, args.seed, args.days, args.mix)
+
+def main():
+    parser = argparse.ArgumentParser(description='Writes a synthetic PACX journal.')
+    parser.add_argument('file', metavar='FILE', help='save file to write (text, binary or .db)')
+    add_journal_arguments(parser)
+    args = parser.parse_args()
+    store = make_store(args)
+    storage.open_backend(args.file).save(store)
+    print('Wrote {} transactions ({} to {}) to {}'.format(len(store), store.get_date(0), store.get_date(-1), args.file))
+
+if __name__ == '__main__':
+    main()
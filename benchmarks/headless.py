@@ -0,0 +1,180 @@
+'''
+Headless PACX window for the benchmarks
+
+An App without tkinter: the widgets that the timed methods use are replaced by small stand-ins that keep their values
+(the treeviews keep their items), so load_file, show_file_contents, init_analysis, add_transaction and
+set_average_text run the same code as in the window, without drawing. The graphs are not made (axes1 is None, as
+before the graph tab is shown)
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PACX
+
+class Variable:
+    #tk.StringVar/tk.IntVar
+    def __init__(self, value=''):
+        self.__value = value
+
+    def get(self):
+        return self.__value
+
+    def set(self, value):
+        self.__value = value
+
+class Entry:
+    #ttk.Entry
+    def __init__(self):
+        self.__text = ''
+
+    def get(self):
+        return self.__text
+
+    def delete(self, first, last=None):
+        self.__text = ''
+
+    def insert(self, index, text):
+        self.__text = text
+
+    def focus_set(self):
+        pass
+
+class Combobox:
+    #ttk.Combobox, current() is the index of the selected value
+    def __init__(self, current=0):
+        self.__current = current
+        self.__values = []
+
+    def current(self, index=None):
+        if index == None:
+            return self.__current
+        self.__current = index
+
+    def config(self, values=None, **options):
+        if values != None:
+            self.__values = list(values)
+
+    configure = config
+
+    def get(self):
+        return str(self.__values[self.__current]) if len(self.__values) > 0 else ''
+
+    def set(self, value):
+        if value in self.__values:
+            self.__current = self.__values.index(value)
+
+class Treeview:
+    #ttk.Treeview, {iid: [parent, children, values, open]}
+    def __init__(self):
+        self.__items = {'': [None, [], [], True]}
+        self.__count = 0
+
+    def insert(self, parent, index, iid=None, values=(), tags=(), text='', open=False):
+        if iid == None:
+            self.__count += 1
+            iid = 'I{:06X}'.format(self.__count)
+        if iid in self.__items:
+            raise ValueError('Item {} already exists'.format(iid))
+        self.__items[iid] = [parent, [], list(values), open]
+        children = self.__items[parent][1]
+        if index == 'end':
+            children.append(iid)
+        else:
+            children.insert(int(index), iid)
+        return iid
+
+    def delete(self, *items):
+        for item in items:
+            if item in self.__items:
+                self.delete(*self.__items[item][1])
+                self.__items[self.__items[item][0]][1].remove(item)
+                del self.__items[item]
+
+    def get_children(self, item=''):
+        return tuple(self.__items[item][1])
+
+    def item(self, item, option=None, values=None, open=None, **options):
+        if values != None:
+            self.__items[item][2] = list(values)
+        if open != None:
+            self.__items[item][3] = open
+        if option == 'values':
+            return tuple(self.__items[item][2])
+        if option == 'open':
+            return self.__items[item][3]
+
+    def set(self, item, column=None):
+        return self.__items[item][2][int(column) - 1]
+
+    def parent(self, item):
+        return self.__items[item][0]
+
+    def index(self, item):
+        return self.__items[self.__items[item][0]][1].index(item)
+
+    def exists(self, item):
+        return item in self.__items
+
+    def selection(self):
+        return ()
+
+    def focus(self, item=None):
+        return ''
+
+    def ignore(self, *args, **options):
+        pass
+
+    yview = see = selection_set = selection_remove = tag_configure = ignore
+
+class Notebook:
+    #ttk.Notebook, select() is the name of the tab on screen
+    def __init__(self):
+        self.__selected = ''
+
+    def select(self, tab=None):
+        if tab == None:
+            return self.__selected
+        self.__selected = str(tab)
+
+def make_app(period=1, period2=1):
+    #App with the state of App.__init__ and stand-ins for its widgets, period 0-3 and period2 1-6 as in the window
+    app = PACX.App.__new__(PACX.App)
+    app.tk = None
+    app.filenames = []
+    app.filename = None
+    app.startup_times = None
+    app.init_variables()
+    app.period = period
+    app.period2 = period2
+    app.treeview, app.treeview2, app.treeview3 = Treeview(), Treeview(), Treeview()
+    app.treeview4, app.treeview5 = Treeview(), Treeview()
+    #tabs by name, app.notebook.select(app.names_frame) shows the Descriptions tab
+    app.notebook, app.names_frame, app.trend_frame = Notebook(), 'names', 'trend'
+    app.cb_group4, app.cb_group5, app.cb_trend = Combobox(0), Combobox(1), Combobox()
+    app.cb_ledger, app.cb_start, app.cb_end = Combobox(), Combobox(), Combobox()
+    #averages of needed expenses and net by default
+    app.cb_average1, app.cb_average2 = Combobox(1), Combobox(8)
+    app.cb_year, app.cb_month, app.cb_day = Variable(), Combobox(), Variable()
+    app.e_amount, app.e_name, app.e_type, app.e_filter = Entry(), Entry(), Entry(), Entry()
+    app.info_text = Variable()
+    app.average_text1, app.average_text2 = Variable(), Variable()
+    app.stats_text1, app.stats_text2 = Variable(), Variable()
+    app.check_var1, app.check_var2, app.check_var3, app.check_var4, app.check_var5 = [Variable(1)] + [Variable(0) for n in range(4)]
+    app.axes1 = app.canvas1 = app.axes2 = app.canvas2 = None
+    app.bars1 = app.bars1_x = app.graph_heights = None
+    #tk.Tk methods used by the timed methods
+    app.after = lambda *args: None
+    app.update_idletasks = lambda: None
+    app.title = lambda *args: None
+    return app
+
+def enter(app, amount, name, type_, date):
+    #types an entry and presses enter (add_transaction), date is a datetime.date
+    app.e_amount.insert(0, str(amount))
+    app.e_name.insert(0, name)
+    app.e_type.insert(0, str(type_))
+    app.cb_year.set(str(date.year))
+    app.cb_month.current(date.month - 1)
+    app.cb_day.set(str(date.day))
+    app.add_transaction()
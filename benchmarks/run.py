@@ -0,0 +1,120 @@
+'''
+End-to-end benchmark of the PACX window on a synthetic journal
+
+Times what a user waits for, on the headless window (benchmarks/headless.py): load_file, show_file_contents for each
+period (days/weeks/months/quarters), init_analysis for each analysis period (weeks/months/quarters/years/fortnights/fiscal years),
+set_average_text, add_transaction (on the last date and back-dated to the middle of the journal), save_file (only the
+changes) and a full save. Every run starts from a fresh copy of the journal, the best and all the times of each step are
+written as JSON with the parameters and versions, so runs of different commits can be compared.
+usage: python benchmarks/run.py [-h] [--lines N] [--start YYYY-MM-DD] [--days N] [--mix N,N,N,N,N] [--seed N]
+                                [--format {text,binary,sqlite}] [--adds N] [--repeat N] [--output FILE]
+eg. python benchmarks/run.py --lines 1000000 --format binary --output before.json
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import datetime as dt
+
+import numpy as np
+
+import synthetic
+import generate
+import headless
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+
+EXTENSIONS = {'text': '.txt', 'binary': '.pacx', 'sqlite': '.db'}
+PERIOD_NAMES = ['days', 'weeks', 'months', 'quarters']
+PERIOD2_NAMES = {1: 'weeks', 2: 'months', 3: 'quarters', 4: 'years', 5: 'fortnights', 6: 'fiscal years'}
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def git_version():
+    #commit of the tree being timed (None outside a git checkout)
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_once(filename, adds):
+    #{step: seconds} of one run on filename (changed by the adds and saves)
+    times = {}
+    app = headless.make_app()
+    app.filenames = [filename]
+    app.filename = filename
+    times['load_file'] = timed(app.load_file, filename)
+    for period, name in enumerate(PERIOD_NAMES):
+        app.period = period
+        times['show_file_contents ' + name] = timed(app.show_file_contents)
+    app.period = app.default_period
+    app.show_file_contents()
+    for period2, name in PERIOD2_NAMES.items():
+        app.period2 = period2
+        times['init_analysis ' + name] = timed(app.init_analysis)
+    app.period2 = app.default_period2
+    app.init_analysis()
+    repeats = 100
+    times['set_average_text'] = timed(lambda: [app.set_average_text(app.analysis, n % 2 + 1) for n in range(repeats)]) / repeats
+
+    #same descriptions and amounts as the journal, mean time of one entry
+    last = app.transactions.get_date(-1)
+    middle = app.transactions.get_date(len(app.transactions) // 2)
+    for step, date in [('add_transaction last date', last), ('add_transaction back-dated', middle)]:
+        entries = [synthetic.ENTRIES[n % len(synthetic.ENTRIES)] for n in range(adds)]
+        times[step] = timed(lambda: [headless.enter(app, amount, name, type_, date) for name, type_, amount in entries]) / adds
+
+    times['save_file'] = timed(app.save_file)
+    times['save (full)'] = timed(app.backends[0].save, app.all_transactions)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description='Times the PACX window (headless) on a synthetic journal.')
+    generate.add_journal_arguments(parser)
+    parser.add_argument('--format', choices=list(EXTENSIONS), default='text', help='save file format (default text)')
+    parser.add_argument('--adds', metavar='N', type=int, default=50, help='entries added per run, of each kind (default 50)')
+    parser.add_argument('--repeat', metavar='N', type=int, default=3, help='number of runs (default 3)')
+    parser.add_argument('--output', metavar='FILE', help='write the JSON to FILE instead of printing it')
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as folder:
+        original = os.path.join(folder, 'journal' + EXTENSIONS[args.format])
+        store = generate.make_store(args)
+        storage.open_backend(original).save(store)
+        size = os.path.getsize(original)
+        for n in range(args.repeat):
+            #the saves change the file and add a journal next to it
+            filename = os.path.join(folder, 'run {}{}'.format(n, EXTENSIONS[args.format]))
+            shutil.copyfile(original, filename)
+            runs.append(run_once(filename, args.adds))
+
+    result = {
+        'version': git_version(),
+        'date': dt.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'parameters': {'lines': args.lines, 'start': args.start.isoformat(), 'days': args.days, 'mix': args.mix,
+                       'seed': args.seed, 'format': args.format, 'file_size': size, 'adds': args.adds, 'repeat': args.repeat},
+        'seconds': {step: {'best': min(run[step] for run in runs), 'runs': [run[step] for run in runs]} for step in runs[0]},
+    }
+    text = json.dumps(result, indent=2)
+    if args.output == None:
+        print(text)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+
+if __name__ == '__main__':
+    main()
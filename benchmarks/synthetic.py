@@ -0,0 +1,43 @@
+'''
+Synthetic PACX journals for the benchmarks
+
+Writes save files that look like "Boren Personal.txt" (same descriptions, types and amounts), with any number of lines
+'''
+import os
+import sys
+import datetime as dt
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import savefile
+import transaction
+
+#(description, type, typical amount)
+ENTRIES = [('groceries', 1, -35.0), ('transport', 1, -20.0), ('drive', 1, -2.99), ('spark', 1, -20.0),
+           ('trumpet rent', 1, -164.3), ('food', 2, -8.0), ('breakfast', 2, -6.9), ('fishing', 2, -75.0),
+           ('studylink', 3, 176.86), ('wages', 3, 420.0), ('mic (sm58)', 4, -267.0), ('guitar string', 4, -19.95),
+           ('vincent return', 5, 100.0)]
+
+def make_store(lines, start=dt.date(2000, 1, 1), seed=0, days=None, type_mix=None):
+    #'lines' entries over 'days' days from 'start' (default about 4 entries per day)
+    #type_mix is the share of each type 1-5 (eg. (40, 35, 15, 5, 5)), default every description equally often
+    rng = np.random.default_rng(seed)
+    if days == None:
+        days = max(1, lines // 4)
+    dates = np.sort(np.datetime64(start, 'D') + rng.integers(0, days, lines))
+    entry_types = np.array([e[1] for e in ENTRIES])
+    if type_mix == None:
+        entry = rng.integers(0, len(ENTRIES), lines)
+    else:
+        #a type's share is split between its descriptions
+        weights = np.array([type_mix[t - 1] / np.count_nonzero(entry_types == t) for t in entry_types], dtype=np.float64)
+        entry = rng.choice(len(ENTRIES), lines, p=weights / weights.sum())
+    typical = np.array([e[2] for e in ENTRIES])
+    amounts = np.rint(typical[entry] * rng.uniform(0.5, 1.5, lines) * 100).astype(np.int64)
+    types = entry_types[entry]
+    return transaction.TransactionStore.from_columns(amounts, entry, [e[0] for e in ENTRIES], types, dates)
+
+def write_journal(filename, lines, start=dt.date(2000, 1, 1), seed=0, days=None, type_mix=None, binary=None):
+    #binary as savefile.save (None: by the extension)
+    savefile.save(filename, make_store(lines, start, seed, days, type_mix), binary)
@@ -0,0 +1,154 @@
+'''
+PACX formatting
+
+Date, month/weekday name and currency strings shown by PACX (no tkinter needed)
+The date strings are cached (a journal has few distinct dates), the currency format is read from the locale once
+and whole columns can be formatted at a time (currency_column)
+'''
+import datetime as dt
+import functools
+import locale
+
+import numpy as np
+
+WEEKDAY_NAMES = {'short':('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'),
+                 'full':('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')}
+#index 1-12
+MONTH_NAMES = {'short':(None, 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'),
+               'full':(None, 'January', 'Febuary', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+                       'October', 'November', 'December')}
+#dates kept by the date string caches
+DATE_CACHE_SIZE = 8192
+
+def weekday_name(num, option='short'):
+    if option not in WEEKDAY_NAMES:
+        raise ValueError('Wrong option (short or full)')
+    return WEEKDAY_NAMES[option][num]
+
+def month_name(num, option='short'):
+    if option not in MONTH_NAMES:
+        raise ValueError('Wrong option (short or full)')
+    if not 1 <= num <= 12:
+        raise KeyError(num)
+    return MONTH_NAMES[option][num]
+
+def convert_date_str(date):
+    #date is a datetime.date object or string
+    if isinstance(date, dt.date):
+        return date_str(date)
+    elif isinstance(date, str):
+        return str_to_date(date)
+    else:
+        raise TypeError('Wrong type! (convert_date_str)')
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def date_str(date):
+    #eg. 20/04/2016
+    return '{:02d}/{:02d}/{:04d}'.format(date.day, date.month, date.year)
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def date_label(date):
+    #date of a transaction on screen, eg. 20/04/2016 (Wed)
+    return date_str(date) + ' (' + WEEKDAY_NAMES['short'][date.weekday()] + ')'
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def str_to_date(str_):
+    #eg. '20/04/2016' or '20/04/2016 (Wed)'
+    temp = str_
+    day = int(temp[:temp.index('/')])
+    temp = temp[temp.index('/') + 1:]
+    month = int(temp[:temp.index('/')])
+    if temp.find(' (') == -1:
+        year = int(temp[temp.index('/') + 1:])
+    else:
+        year = int(temp[temp.index('/') + 1:temp.index(' (')])
+    return dt.date(year, month, day)
+
+def set_locale(name):
+    #sets the locale (LC_ALL) and forgets the currency format of the previous one
+    locale.setlocale(locale.LC_ALL, name)
+    money_format.cache_clear()
+
+@functools.lru_cache(maxsize=1)
+def money_format():
+    #(fraction digits, decimal point, thousands separator, grouping, (p_sign_posn, positive_sign), (n_sign_posn, negative_sign))
+    #of locale.currency(symbol=False, grouping=True), read once since localeconv() is slow
+    conv = locale.localeconv()
+    if conv['frac_digits'] == locale.CHAR_MAX:
+        #no locale set (eg. the "C" locale when there is no GUI), same as '{:,.2f}'
+        return 2, '.', ',', [3, 0], (1, ''), (1, '-')
+    return (conv['frac_digits'], conv['mon_decimal_point'], conv['mon_thousands_sep'], conv['mon_grouping'],
+            (conv['p_sign_posn'], conv['positive_sign']), (conv['n_sign_posn'], conv['negative_sign']))
+
+def group_digits(digits, grouping, separator):
+    #digits is a string of digits, grouping as in localeconv() (eg. [3, 3, 0], 0 repeats the last group)
+    if separator == '':
+        return digits
+    if grouping == [3, 0] or grouping == [3, 3, 0]:
+        return '{:,}'.format(int(digits)).replace(',', separator)
+    groups = []
+    last = None
+    for size in grouping:
+        if size == locale.CHAR_MAX:
+            break
+        if size == 0:
+            while len(digits) > last:
+                groups.append(digits[-last:])
+                digits = digits[:-last]
+            break
+        if len(digits) <= size:
+            break
+        groups.append(digits[-size:])
+        digits = digits[:-size]
+        last = size
+    groups.append(digits)
+    return separator.join(reversed(groups))
+
+def money_str(whole, fraction, negative, format_):
+    #whole and fraction are the digits before and after the decimal point
+    digits, point, separator, grouping, positive, negative_ = format_
+    str_ = group_digits(whole, grouping, separator)
+    if digits > 0:
+        str_ = str_ + point + fraction
+    return sign_template(*(negative_ if negative else positive)).format(str_)
+
+def currency(number):
+    if isinstance(number, str):
+        number = float(number)
+    elif not isinstance(number, (float, int)):
+        raise TypeError('Wrong type (currency)')
+    format_ = money_format()
+    whole, _, fraction = '{:.{}f}'.format(abs(number), format_[0]).partition('.')
+    return money_str(whole, fraction, number < 0, format_)
+
+def sign_template(position, sign):
+    #'{}' is the number without sign, as locale.currency places the sign
+    if position == 0:
+        return '({})'
+    elif position == 2 or position == 4:
+        return '{}' + sign
+    else:
+        return sign + '{}'
+
+def currency_column(amounts):
+    #list of currency strings of an array of amounts (dollars), rounded to cents with numpy instead of one at a time
+    digits, point, separator, grouping, positive, negative = money_format()
+    scale = 10 ** digits
+    amounts = np.asarray(amounts, dtype=np.float64)
+    scaled = np.abs(amounts) * scale
+    units = np.rint(scaled).astype(np.int64)
+    #rint rounds halves to even after the product is rounded, currency rounds the exact value of the float ('{:.2f}'),
+    #so the few amounts close to half a cent are rounded as there (eg. 0.005 is 0.01 in both)
+    near = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if len(near) > 0:
+        units[near] = [int('{:.{}f}'.format(x, digits).replace('.', '')) for x in np.abs(amounts[near]).tolist()]
+    wholes, fractions = np.divmod(units, scale)
+    if separator == ',' and grouping in ([3, 0], [3, 3, 0]):
+        whole_strs = list(map('{:,}'.format, wholes.tolist()))
+    else:
+        whole_strs = [group_digits(str(w), grouping, separator) for w in wholes.tolist()]
+    if digits > 0:
+        fraction_str = point + '{:0' + str(digits) + 'd}'
+        whole_strs = list(map(str.__add__, whole_strs, map(fraction_str.format, fractions.tolist())))
+    templates = (sign_template(*positive).format, sign_template(*negative).format)
+    return [templates[n](w) for w, n in zip(whole_strs, (amounts < 0).tolist())]
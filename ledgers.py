@@ -0,0 +1,70 @@
+'''
+PACX ledgers
+
+Several save files (eg. one per person) open at once as one journal: the files are loaded in parallel by a process
+pool and merged into one transaction.TransactionStore sorted by date. The ledger column of the store is the index
+of the file each row came from, for the per-ledger views (select) and for saving each file on its own (split).
+'''
+import os
+import concurrent.futures
+
+import numpy as np
+
+import transaction
+import storage
+
+def load_backend(filename, progress=None):
+    #(backend, store) of one file, runs in the pool
+    backend = storage.open_backend(filename)
+    return backend, backend.load(progress=progress)
+
+def load(filenames, jobs=None, progress=None):
+    #[(backend, store)] in the order of filenames, one process per file (up to 'jobs', default one per cpu)
+    #progress(rows loaded) is called as the files are loaded (within a file only without the pool), it can raise to
+    #stop the load (eg. worker.Cancelled), then the files not started yet are not loaded
+    if jobs == None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(filenames))
+    loaded = []
+    if jobs <= 1:
+        for filename in filenames:
+            rows = sum([len(store) for backend, store in loaded])
+            loaded.append(load_backend(filename, None if progress == None else lambda done: progress(rows + done)))
+        return loaded
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    try:
+        for backend, store in executor.map(load_backend, filenames):
+            loaded.append((backend, store))
+            if progress != None:
+                progress(sum([len(store) for backend, store in loaded]))
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return loaded
+
+def merge(stores):
+    #one store of stores that are each sorted by date, the ledger of a row is the index of its store
+    #rows with the same date stay in the order of the stores
+    names = {}
+    amounts, name_ids, types, dates, ledgers = [], [], [], [], []
+    for ledger, store in enumerate(stores):
+        #the name ids of this store in the merged name table
+        ids = np.array([names.setdefault(name, len(names)) for name in store.get_names()], dtype=np.int32)
+        amounts.append(store.get_amounts())
+        name_ids.append(ids[store.get_name_ids()])
+        types.append(store.get_types())
+        dates.append(store.get_dates())
+        ledgers.append(np.full(len(store), ledger, dtype=np.int16))
+    dates = np.concatenate(dates)
+    #the stable sort (timsort) finds the sorted runs and merges them, like a k-way merge without a python loop
+    order = np.argsort(dates, kind='stable')
+    return transaction.TransactionStore.from_columns(np.concatenate(amounts)[order], np.concatenate(name_ids)[order],
+                                                     list(names), np.concatenate(types)[order], dates[order],
+                                                     np.concatenate(ledgers)[order])
+
+def split(store, ledger):
+    #the rows of one ledger as a store of their own (eg. to save that file)
+    return store.select(store.get_ledgers() == ledger)
+
+def ledger_name(filename):
+    #shown in the ledger combobox
+    return os.path.splitext(os.path.basename(filename))[0]
@@ -0,0 +1,143 @@
+'''
+PACX batch reports
+
+Prints (or writes to files) the analysis tables of the GUI, the per-period Needed/Extra/Income/Special/Bonuses and
+Essentials/Plus Extras/Net, and averages over a '* ago' range, for any number of save files without opening the GUI.
+The files are analysed in parallel by a process pool and the reports are written in the order of the files.
+
+usage: python report.py [-h] [--period {week,month,quarter,year,fortnight,fiscal-year}] [--format {text,csv}] [--output FOLDER]
+                        [--average CATEGORY] [--start AGO] [--end AGO] [--jobs N] FILE [FILE ...]
+eg. python report.py --period quarter --average Net --average Needed "Boren Personal.txt"
+'''
+import os
+import io
+import sys
+import csv
+import argparse
+import concurrent.futures
+
+import analytics
+import formatting
+import storage
+
+PERIODS = {'week':analytics.WEEK, 'month':analytics.MONTH, 'quarter':analytics.QUARTER, 'year':analytics.YEAR,
+           'fortnight':analytics.FORTNIGHT, 'fiscal-year':analytics.FISCAL_YEAR}
+COLUMNS = ['* ago', 'Period'] + [analytics.CATEGORIES[c] for c in sorted(analytics.CATEGORIES)]
+
+def report_rows(analysis):
+    #the columns of treeview2 and treeview3 together, amounts as numbers
+    rows = []
+    for a in analysis:
+        rows.append([a['ago'], a['period']] + [analytics.category_value(a, c) for c in sorted(analytics.CATEGORIES)])
+    return rows
+
+def average_rows(analysis, categories, start, end):
+    #start and end are '* ago' values (None for the last/first period of the file), the periods of the range before the
+    #first or after the last transaction (eg. the last 4 quarters of a file not used since) count as 0
+    min_ago = analysis[-1]['ago']
+    max_ago = analysis[0]['ago']
+    start = min_ago if start == None else start
+    end = max_ago if end == None else end
+    low, high = min(start, end), max(start, end)
+    rows = []
+    for category in categories:
+        total = 0
+        if low <= max_ago and high >= min_ago:
+            total = sum(analytics.range_values(analysis, category, max(low, min_ago) - min_ago, min(high, max_ago) - min_ago))
+        rows.append([analytics.CATEGORIES[category], low, high, float(total / (high - low + 1))])
+    return rows
+
+def format_text(filename, rows, averages):
+    lines = [filename]
+    widths = [6, 11] + [12] * (len(COLUMNS) - 2)
+    lines.append(''.join([c.rjust(w) for c, w in zip(COLUMNS, widths)]))
+    for row in rows:
+        cells = [str(row[0]), row[1]] + [formatting.currency(x) for x in row[2:]]
+        lines.append(''.join([c.rjust(w) for c, w in zip(cells, widths)]))
+    for category, start, end, mean in averages:
+        lines.append('Average {} from {} to {} ago: {}'.format(category, start, end, formatting.currency(mean)))
+    return '\n'.join(lines) + '\n\n'
+
+def format_csv(filename, rows, averages):
+    #every row starts with the file, so the reports of several files can be printed one after another
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator='\n')
+    writer.writerow(['File'] + COLUMNS)
+    for row in rows:
+        writer.writerow([filename] + row[:2] + ['{:.2f}'.format(x) for x in row[2:]])
+    if len(averages) > 0:
+        writer.writerow([])
+        writer.writerow(['File', 'Average', 'From (ago)', 'To (ago)', 'Amount'])
+        for category, start, end, mean in averages:
+            writer.writerow([filename, category, start, end, '{:.2f}'.format(mean)])
+    return text.getvalue()
+
+def make_report(job):
+    #runs in the worker processes, returns (filename, report text, error message)
+    filename, period, categories, start, end, format_ = job
+    try:
+        #nothing is written into the folders of the files (storage.FileBackend read_only)
+        backend = storage.open_backend(filename, read_only=True)
+        #SQLite files are grouped by the database, other files are loaded
+        analysis = analytics.aggregate(backend, period)
+        if len(analysis) == 0:
+            return filename, None, 'no transactions'
+        rows = report_rows(analysis)
+        averages = average_rows(analysis, categories, start, end)
+        if format_ == 'csv':
+            return filename, format_csv(filename, rows, averages), None
+        else:
+            return filename, format_text(filename, rows, averages), None
+    except Exception as error:
+        return filename, None, '{}: {}'.format(type(error).__name__, error)
+
+def category_number(name):
+    for number, category in analytics.CATEGORIES.items():
+        if category.lower() == name.lower():
+            return number
+    raise argparse.ArgumentTypeError('unknown category (one of: {})'.format(', '.join(analytics.CATEGORIES.values())))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Analysis tables of PACX save files')
+    parser.add_argument('files', metavar='FILE', nargs='+', help='save files (text, binary or .db)')
+    parser.add_argument('--period', choices=list(PERIODS), default='month', help='analysis period (default month)')
+    parser.add_argument('--format', choices=['text', 'csv'], default='text', help='report format (default text)')
+    parser.add_argument('--output', metavar='FOLDER', help='write one report per file into FOLDER instead of printing')
+    parser.add_argument('--average', metavar='CATEGORY', type=category_number, action='append', default=[],
+                        help='also print the average of a category (Needed, Extra, ..., Net), can be repeated')
+    parser.add_argument('--start', metavar='AGO', type=int, help="first period of the averages ('* ago', default the last period)")
+    parser.add_argument('--end', metavar='AGO', type=int, help="last period of the averages ('* ago', default the first period)")
+    parser.add_argument('--jobs', metavar='N', type=int, default=os.cpu_count(), help='worker processes (default: one per cpu)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    jobs = [(f, PERIODS[args.period], args.average, args.start, args.end, args.format) for f in args.files]
+    if args.output != None:
+        os.makedirs(args.output, exist_ok=True)
+    if args.jobs <= 1 or len(jobs) == 1:
+        results = map(make_report, jobs)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs)
+        results = executor.map(make_report, jobs, chunksize=max(1, len(jobs) // (args.jobs * 4)))
+    errors = 0
+    try:
+        #written as they come in, in the order of the files
+        for filename, text, error in results:
+            if error != None:
+                errors += 1
+                print('{}: {}'.format(filename, error), file=sys.stderr)
+            elif args.output != None:
+                name = os.path.splitext(os.path.basename(filename))[0] + ('.csv' if args.format == 'csv' else '.txt')
+                with open(os.path.join(args.output, name), 'w') as file:
+                    file.write(text)
+            else:
+                sys.stdout.write(text)
+    finally:
+        if executor != None:
+            executor.shutdown()
+    return 1 if errors > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
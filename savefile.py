@@ -0,0 +1,306 @@
+'''
+PACX save files
+
+Reading and writing the text save file format:
+
+[PACX save file]
+t//amount,,,description,,,type,,,yyyy-mm-dd
+
+and the binary format (".pacx" files), which is loaded with np.memmap without parsing:
+
+PACXBIN1, rows (uint64), size of the name table (uint64)
+one 24 byte record per row: amount in cents (int64), date (datetime64[D]), name id (int32), type (uint8)
+name table: the names in utf-8, separated by new lines
+
+usage: python savefile.py <from file> <to file>   (converts, the format of the new file comes from its extension)
+'''
+import os
+import datetime as dt
+
+import numpy as np
+
+import transaction
+
+HEADER = '[PACX save file]'
+JOURNAL_HEADER = '[PACX journal]'
+SEPARATOR = ',,,'
+BINARY_HEADER = b'PACXBIN1'
+BINARY_EXTENSION = '.pacx'
+RECORD = np.dtype([('amount', '<i8'), ('date', '<M8[D]'), ('name', '<i4'), ('type', 'u1')], align=True)
+BINARY_OFFSET = len(BINARY_HEADER) + 16
+#rows written per write() call
+WRITE_CHUNK = 65536
+
+def parse_line(line):
+    #'t//-6.9,,,breakfast,,,2,,,2017-01-05' -> (-6.9, 'breakfast', 2, '2017-01-05')
+    line = line.rstrip('\n')
+    if line[:3] != 't//':
+        raise IOError('file transaction indent error')
+    fields = line[3:].split(SEPARATOR)
+    if len(fields) != 4:
+        raise IOError('Wrong number of fields in line: ' + line)
+    return float(fields[0]), fields[1], int(fields[2]), fields[3]
+
+def format_line(amount, name, type_, date):
+    return 't//{},,,{},,,{},,,{}\n'.format(amount, name, type_, date)
+
+def parse_date(string):
+    #also reads dates without zero padding (eg. 2017-1-5)
+    year, month, day = string.split('-')
+    return dt.date(int(year), int(month), int(day))
+
+def read_lines(filename):
+    #generator of the parsed transaction lines of a save file, one line in memory at a time
+    with open(filename, 'r') as file:
+        if file.readline().rstrip('\n') != HEADER:
+            raise IOError('File incompatible')
+        for line in file:
+            yield parse_line(line)
+
+def read_chunks(filename, chunk_size=1 << 22):
+    #generator of (amounts, names, types, dates) lists of strings, about chunk_size characters of the file at a time
+    with open(filename, 'r') as file:
+        if file.readline().rstrip('\n') != HEADER:
+            raise IOError('File incompatible')
+        while True:
+            lines = file.readlines(chunk_size)
+            if len(lines) == 0:
+                break
+            text = ''.join(lines)
+            if not text.endswith('\n'):
+                text += '\n'
+            #one split for the whole chunk instead of one per line
+            fields = text.replace(SEPARATOR, '\n').split('\n')[:-1]
+            if len(fields) != len(lines) * 4:
+                #find the bad line
+                for line in lines:
+                    parse_line(line)
+            amounts = fields[0::4]
+            if set([x[:3] for x in amounts]) != {'t//'}:
+                raise IOError('file transaction indent error')
+            yield [x[3:] for x in amounts], fields[1::4], fields[2::4], fields[3::4]
+
+def is_binary(filename):
+    #by the header if the file exists, otherwise by the extension
+    if os.path.exists(filename):
+        with open(filename, 'rb') as file:
+            return file.read(len(BINARY_HEADER)) == BINARY_HEADER
+    else:
+        return filename.lower().endswith(BINARY_EXTENSION)
+
+def load(filename, progress=None):
+    #reads a save file (either format) into a transaction.TransactionStore sorted by date
+    #progress(rows read) is called before each chunk of a text file (the binary file is mapped, not read)
+    if is_binary(filename):
+        return load_binary(filename)
+    else:
+        return load_text(filename, progress)
+
+def save(filename, store, binary=None):
+    if binary == None:
+        binary = is_binary(filename)
+    if binary:
+        save_binary(filename, store)
+    else:
+        save_text(filename, store)
+
+def load_text(filename, progress=None):
+    amounts, name_ids, types, dates = [], [], [], []
+    name_table = {}
+    rows = 0
+    for amount_strs, names, type_strs, date_strs in read_chunks(filename):
+        if progress != None:
+            progress(rows)
+        rows += len(amount_strs)
+        amounts.append(np.rint(np.fromiter(map(float, amount_strs), np.float64, len(amount_strs)) * 100).astype(np.int64))
+        for name in dict.fromkeys(names):
+            name_table.setdefault(name, len(name_table))
+        name_ids.append(np.fromiter(map(name_table.__getitem__, names), np.int32, len(names)))
+        types.append(np.fromiter(map(int, type_strs), np.int64, len(type_strs)))
+        try:
+            date_array = np.array(date_strs, dtype='datetime64[D]')
+        except ValueError:
+            date_array = None
+        #numpy also reads '' (NaT) and partial dates ('2017-02' is the 1st), anything but yyyy-mm-dd goes through
+        #parse_date, which reads unpadded dates and raises on the rest
+        if date_array is None or set(map(len, date_strs)) != {10} or np.isnat(date_array).any():
+            date_array = np.array([parse_date(date) for date in date_strs], dtype='datetime64[D]')
+        dates.append(date_array)
+    if len(amounts) == 0:
+        return transaction.TransactionStore()
+    types = np.concatenate(types)
+    if types.min() < 1 or types.max() > 5:
+        raise ValueError('Choose a correct integer ' + str(types[(types < 1) | (types > 5)][0]))
+    store = transaction.TransactionStore.from_columns(np.concatenate(amounts), np.concatenate(name_ids), list(name_table),
+                                                      types, np.concatenate(dates))
+    store.sort()
+    return store
+
+def iter_lines(store):
+    #generator of the save file lines of a store, made a chunk of columns at a time
+    names = np.array(store.get_names(), dtype=object)
+    for start in range(0, len(store), WRITE_CHUNK):
+        stop = start + WRITE_CHUNK
+        amounts = (store.get_amounts()[start:stop] / 100).tolist()
+        name_list = names[store.get_name_ids()[start:stop]].tolist()
+        types = store.get_types()[start:stop].tolist()
+        #every date is only turned into a string once
+        unique_dates, inverse = np.unique(store.get_dates()[start:stop], return_inverse=True)
+        dates = np.array(np.datetime_as_string(unique_dates), dtype=object)[inverse].tolist()
+        yield ''.join([f't//{a},,,{n},,,{t},,,{d}\n' for a, n, t, d in zip(amounts, name_list, types, dates)])
+
+def save_text(filename, store):
+    with open(filename, 'w', buffering=1 << 20) as file:
+        file.write(HEADER + '\n')
+        file.writelines(iter_lines(store))
+
+def load_binary(filename):
+    #the columns of the store are copy-on-write views of the memory mapped file
+    with open(filename, 'rb') as file:
+        if file.read(len(BINARY_HEADER)) != BINARY_HEADER:
+            raise IOError('File incompatible')
+        rows, name_size = np.frombuffer(file.read(16), dtype='<u8').tolist()
+        file.seek(BINARY_OFFSET + rows * RECORD.itemsize)
+        name_table = file.read(name_size)
+    if len(name_table) != name_size:
+        raise IOError('Binary save file is cut off')
+    #'' is the table of a file whose only name is ''
+    names = name_table.decode('utf-8').split('\n')
+    if rows == 0:
+        return transaction.TransactionStore()
+    records = np.memmap(filename, dtype=RECORD, mode='c', offset=BINARY_OFFSET, shape=(rows,))
+    types = records['type']
+    if types.min() < 1 or types.max() > 5:
+        raise ValueError('Choose a correct integer ' + str(types[(types < 1) | (types > 5)][0]))
+    store = transaction.TransactionStore.from_columns(records['amount'], records['name'], names, types, records['date'])
+    dates = store.get_dates()
+    if np.any(dates[1:] < dates[:-1]):
+        store.sort()
+    return store
+
+def save_binary(filename, store):
+    #zeros, so the padding of the records is not left over memory
+    records = np.zeros(len(store), dtype=RECORD)
+    records['amount'] = store.get_amounts()
+    records['date'] = store.get_dates()
+    records['name'] = store.get_name_ids()
+    records['type'] = store.get_types()
+    name_table = '\n'.join(store.get_names()).encode('utf-8')
+    with open(filename, 'wb') as file:
+        file.write(BINARY_HEADER)
+        file.write(np.array([len(store), len(name_table)], dtype='<u8').tobytes())
+        records.tofile(file)
+        file.write(name_table)
+
+def convert(from_filename, to_filename):
+    #lossless conversion between the formats, the new format comes from the extension of to_filename
+    save(to_filename, load(from_filename), binary=to_filename.lower().endswith(BINARY_EXTENSION))
+
+def file_stamp(filename):
+    #size and modification time, changes whenever the file is rewritten
+    info = os.stat(filename)
+    return '{} {}'.format(info.st_size, info.st_mtime_ns)
+
+def save_atomic(filename, store):
+    #the old file stays complete until the new one is written
+    temp = filename + '.tmp'
+    save(temp, store, binary=is_binary(filename))
+    #a store loaded from a binary file still maps it (load_binary) and a mapped file cannot be replaced on Windows
+    store.own_columns()
+    os.replace(temp, filename)
+
+class Journal:
+
+    #append-only log of the changes made since the save file was last written in full, kept next to it as
+    #"<save file>.journal", eg.
+    #[PACX journal] <size and mtime of the save file>
+    #a//amount,,,description,,,type,,,date      (added)
+    #d//amount,,,description,,,type,,,date      (deleted last transaction)
+    def __init__(self, filename, compact_after=5000):
+        self.__filename = filename
+        self.__journal_name = filename + '.journal'
+        #records in the journal file / not saved yet
+        self.__saved = 0
+        self.__pending = []
+        #the journal file ends with a half written record
+        self.__damaged = False
+        #rewrite the save file once the journal is this long
+        self.__compact_after = compact_after
+
+    def get_journal_name(self):
+        return self.__journal_name
+
+    def has_pending(self):
+        return len(self.__pending) > 0
+
+    def record_add(self, t):
+        self.__pending.append('a//' + format_line(t.get_amount(), t.get_name(), t.get_type(), t.get_date())[3:])
+
+    def record_delete(self, t):
+        self.__pending.append('d//' + format_line(t.get_amount(), t.get_name(), t.get_type(), t.get_date())[3:])
+
+    #applies the journal to the store just loaded from the save file, returns the number of records applied
+    #a journal left over from before the last full save is removed, unless remove_stale is False
+    def replay(self, store, remove_stale=True):
+        self.__saved = 0
+        self.__pending = []
+        self.__damaged = False
+        if not os.path.exists(self.__journal_name):
+            return 0
+        with open(self.__journal_name, 'r') as file:
+            header = file.readline().rstrip('\n')
+            if header != JOURNAL_HEADER + ' ' + file_stamp(self.__filename):
+                #left over from before the last full save
+                file.close()
+                if remove_stale:
+                    os.remove(self.__journal_name)
+                return 0
+            for line in file:
+                if not line.endswith('\n'):
+                    #half written record (crash while saving), the next commit rewrites everything
+                    self.__damaged = True
+                    break
+                amount, name, type_, date = parse_line('t//' + line[3:])
+                t = transaction.Transaction(amount, name, type_, parse_date(date))
+                if line[:3] == 'a//':
+                    store.insert_sorted(t)
+                elif line[:3] == 'd//':
+                    if len(store) == 0 or str(store[-1]) != str(t):
+                        raise IOError('Journal does not match the save file: ' + line.rstrip('\n'))
+                    store.pop()
+                else:
+                    raise IOError('journal record error')
+                self.__saved += 1
+        return self.__saved
+
+    #saves the pending changes, by appending them to the journal or by rewriting the save file
+    def commit(self, store):
+        if (not os.path.exists(self.__filename) or self.__damaged or
+            self.__saved + len(self.__pending) > self.__compact_after):
+            self.compact(store)
+        elif self.has_pending():
+            new_file = not os.path.exists(self.__journal_name) or self.__saved == 0
+            with open(self.__journal_name, 'w' if new_file else 'a') as file:
+                if new_file:
+                    file.write(JOURNAL_HEADER + ' ' + file_stamp(self.__filename) + '\n')
+                file.writelines(self.__pending)
+                file.flush()
+                os.fsync(file.fileno())
+            self.__saved += len(self.__pending)
+            self.__pending = []
+
+    #writes everything into the save file and starts an empty journal
+    def compact(self, store):
+        save_atomic(self.__filename, store)
+        if os.path.exists(self.__journal_name):
+            os.remove(self.__journal_name)
+        self.__saved = 0
+        self.__pending = []
+        self.__damaged = False
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 3:
+        print('usage: python savefile.py <from file> <to file>')
+    else:
+        convert(sys.argv[1], sys.argv[2])
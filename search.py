@@ -0,0 +1,178 @@
+'''
+PACX search
+
+Finds the transactions of a transaction.TransactionStore by description, amount, type and date, eg.
+
+index = search.SearchIndex(store)
+rows = index.find(search.parse('groc type:1 amount:-50..0 date:1/1/2017..30/6/2017'))
+
+Descriptions repeat (the store interns them), so the words are looked up in an inverted index of the tokens of the
+distinct descriptions and the rows are picked by their name id; the date range is a binary search of the date order
+of the store. The index reads the columns of the store when it is used, so it stays valid as rows are added and
+deleted, only the descriptions new since the last search are indexed.
+'''
+import re
+import bisect
+import datetime as dt
+
+import numpy as np
+
+import transaction
+import formatting
+
+TOKEN = re.compile('[a-z0-9]+')
+#"a phrase" or key:value
+PHRASE = re.compile('"([^"]*)"?')
+FIELD = re.compile('^(type|t|amount|a|date|d):(.*)$')
+
+def tokens(name):
+    #lowercase letters/digits runs, eg. 'Mic (SM58)' -> ['mic', 'sm58']
+    return TOKEN.findall(name.lower())
+
+class Query:
+
+    #words: each starts a token of the description, phrases: each is part of the description (lowercase)
+    #low/high: amount range in cents, types: set of types 1-5, start/end: datetime.date, None is no limit
+    def __init__(self, words=(), phrases=(), low=None, high=None, types=None, start=None, end=None):
+        self.words = list(words)
+        self.phrases = list(phrases)
+        self.low = low
+        self.high = high
+        self.types = types
+        self.start = start
+        self.end = end
+
+    def is_empty(self):
+        return (len(self.words) == 0 and len(self.phrases) == 0 and self.low == None and self.high == None
+                and self.types == None and self.start == None and self.end == None)
+
+    def matches_name(self, name):
+        name_tokens = tokens(name)
+        return (all(any(token.startswith(word) for token in name_tokens) for word in self.words)
+                and all(phrase in name.lower() for phrase in self.phrases))
+
+    #t is anything with the Transaction getters (eg. the one just added)
+    def matches(self, t):
+        amount = transaction.to_cents(t.get_amount())
+        date = t.get_date()
+        return (self.matches_name(t.get_name())
+                and (self.low == None or amount >= self.low) and (self.high == None or amount <= self.high)
+                and (self.types == None or t.get_type() in self.types)
+                and (self.start == None or date >= self.start) and (self.end == None or date <= self.end))
+
+def parse(text):
+    #text of the filter box: words, "phrases", type:1,2  amount:LOW..HIGH  date:FROM..TO (dd/mm/yyyy or yyyy)
+    #either end of a range can be left out, a single value is the range of that value, raises ValueError
+    query = Query(phrases=[p.lower() for p in PHRASE.findall(text) if p != ''])
+    for part in PHRASE.sub(' ', text).split():
+        field = FIELD.match(part.lower())
+        if field == None:
+            query.words += tokens(part)
+        elif field.group(1) in ('type', 't'):
+            try:
+                query.types = {int(x) for x in field.group(2).split(',') if x != ''}
+            except ValueError:
+                raise ValueError('types are numbers 1 to 5: ' + part)
+            if not query.types <= {1, 2, 3, 4, 5}:
+                raise ValueError('types are numbers 1 to 5: ' + part)
+        elif field.group(1) in ('amount', 'a'):
+            query.low, query.high = parse_range(field.group(2), transaction.to_cents, transaction.to_cents, part)
+        else:
+            query.start, query.end = parse_range(field.group(2), parse_date, parse_date_end, part)
+    return query
+
+def parse_range(text, convert_low, convert_high, part):
+    #'LOW..HIGH', 'LOW..', '..HIGH' or 'VALUE', (low, high) with None for no limit
+    low, dots, high = text.partition('..')
+    if dots == '':
+        high = low
+    try:
+        return None if low == '' else convert_low(low), None if high == '' else convert_high(high)
+    except (ValueError, IndexError):
+        raise ValueError('not a range: ' + part)
+
+def parse_date(text):
+    #'dd/mm/yyyy' or a year (its first day)
+    if text.isdigit():
+        return dt.date(int(text), 1, 1)
+    return formatting.str_to_date(text)
+
+def parse_date_end(text):
+    #'dd/mm/yyyy' or a year (its last day)
+    if text.isdigit():
+        return dt.date(int(text), 12, 31)
+    return formatting.str_to_date(text)
+
+class SearchIndex:
+
+    def __init__(self, store):
+        self.__store = store
+        #{token: [name ids]}, the tokens sorted (prefix search), lowercase names, number of names indexed
+        self.__tokens = {}
+        self.__sorted_tokens = []
+        self.__lower_names = []
+        self.__indexed = 0
+
+    def is_for(self, store):
+        return self.__store is store
+
+    def __update(self):
+        #indexes the names interned since the last search
+        names = self.__store.get_names()
+        for name_id in range(self.__indexed, len(names)):
+            self.__lower_names.append(names[name_id].lower())
+            for token in set(tokens(names[name_id])):
+                if token not in self.__tokens:
+                    self.__tokens[token] = []
+                    bisect.insort(self.__sorted_tokens, token)
+                self.__tokens[token].append(name_id)
+        self.__indexed = len(names)
+
+    def word_names(self, word):
+        #ids of the names with a token starting with word
+        start = bisect.bisect_left(self.__sorted_tokens, word)
+        name_ids = set()
+        for token in self.__sorted_tokens[start:]:
+            if not token.startswith(word):
+                break
+            name_ids.update(self.__tokens[token])
+        return name_ids
+
+    def name_mask(self, query):
+        #True for the name ids matching the words and phrases of query, None if it has none
+        if len(query.words) == 0 and len(query.phrases) == 0:
+            return None
+        self.__update()
+        mask = np.ones(len(self.__lower_names), dtype=bool)
+        for word in query.words:
+            word_mask = np.zeros(len(mask), dtype=bool)
+            word_mask[list(self.word_names(word))] = True
+            mask &= word_mask
+        for phrase in query.phrases:
+            mask &= np.array([phrase in name for name in self.__lower_names], dtype=bool)
+        return mask
+
+    def find(self, query):
+        #sorted indexes of the rows matching query
+        store = self.__store
+        first, last = 0, len(store)
+        if query.start != None:
+            first = int(np.searchsorted(store.get_dates(), np.datetime64(query.start, 'D'), side='left'))
+        if query.end != None:
+            last = store.bisect(query.end)
+        if first >= last:
+            return np.zeros(0, dtype=np.int64)
+        mask = np.ones(last - first, dtype=bool)
+        name_mask = self.name_mask(query)
+        if name_mask is not None:
+            mask &= name_mask[store.get_name_ids()[first:last]]
+        if query.types != None:
+            type_mask = np.zeros(6, dtype=bool)
+            type_mask[list(query.types)] = True
+            mask &= type_mask[store.get_types()[first:last]]
+        amounts = store.get_amounts()[first:last]
+        if query.low != None:
+            mask &= amounts >= query.low
+        if query.high != None:
+            mask &= amounts <= query.high
+        return first + np.flatnonzero(mask)
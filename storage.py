@@ -0,0 +1,289 @@
+'''
+PACX storage backends
+
+A backend is one open save file: it loads it into a transaction.TransactionStore, records the changes made to the
+store and saves them, and gives the per-period totals used by analytics.
+FileBackend: text and binary save files (savefile) with the journal, and the per-period totals of the analysis
+kept next to them (TotalsCache)
+SQLiteBackend: ".db" files, the totals are worked out by SQLite without loading the rows
+'''
+import os
+import sqlite3
+
+import numpy as np
+
+import transaction
+import savefile
+import analytics
+
+SQLITE_EXTENSION = '.db'
+SQLITE_HEADER = b'SQLite format 3\x00'
+CACHE_EXTENSION = '.cache.npz'
+
+def open_backend(filename, read_only=False):
+    #read_only: nothing is written next to a save file (see FileBackend), SQLite files are only read by the queries
+    if is_sqlite(filename):
+        return SQLiteBackend(filename)
+    else:
+        return FileBackend(filename, read_only)
+
+def is_sqlite(filename):
+    #by the header if the file exists, otherwise by the extension
+    if os.path.exists(filename) and os.path.getsize(filename) > 0:
+        with open(filename, 'rb') as file:
+            return file.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    else:
+        return filename.lower().endswith(SQLITE_EXTENSION)
+
+class FileBackend:
+
+    #read_only: loading writes nothing next to the file (the totals cache, removing a stale journal), eg. for report.py
+    def __init__(self, filename, read_only=False):
+        self.__filename = filename
+        self.__read_only = read_only
+        self.__journal = savefile.Journal(filename)
+        self.__totals = TotalsCache(filename, self.__journal.get_journal_name())
+
+    def get_filename(self):
+        return self.__filename
+
+    #the totals cache is read, or made again if it does not match the file
+    #progress(rows done) is called between the chunks of the slow steps (savefile.load, analytics.DailyTotals)
+    def load(self, progress=None):
+        store = savefile.load(self.__filename, progress)
+        self.__journal.replay(store, remove_stale=not self.__read_only)
+        self.__totals.read()
+        if self.__totals.fill(store, progress) and not self.__read_only:
+            self.__totals.write()
+        return store
+
+    def record_add(self, t):
+        self.__journal.record_add(t)
+        self.__totals.apply(t, 1)
+
+    def record_delete(self, t):
+        self.__journal.record_delete(t)
+        self.__totals.apply(t, -1)
+
+    #saves the recorded changes
+    def commit(self, store):
+        self.__journal.commit(store)
+        self.__totals.fill(store)
+        self.__totals.write()
+
+    #saves the whole store
+    def save(self, store):
+        self.__journal.compact(store)
+        self.__totals.fill(store)
+        self.__totals.write()
+
+    #copy of the analytics.PeriodTotals of the loaded file (with the changes recorded since), None if not cached
+    def cached_period_totals(self, period):
+        return self.__totals.get(period)
+
+    def period_totals(self, period):
+        #without loading the file if the cache matches it
+        if not self.__totals.read():
+            self.load()
+        period_totals = self.__totals.get(period)
+        return period_totals.get_first_key(), period_totals.get_totals()
+
+class TotalsCache:
+
+    #analytics.PeriodTotals of a save file for each analysis period, kept next to it in "<save file>.cache.npz" with
+    #the stamps (savefile.file_stamp) of the save file and its journal, so opening the file or changing the analysis
+    #period does not group the transactions again. The totals follow the recorded changes (apply) and are written
+    #again when the file is saved
+    def __init__(self, filename, journal_name):
+        self.__filename = filename
+        self.__journal_name = journal_name
+        self.__cache_name = filename + CACHE_EXTENSION
+        #{period: analytics.PeriodTotals}
+        self.__totals = {}
+
+    def get_cache_name(self):
+        return self.__cache_name
+
+    def stamp(self):
+        #changes whenever the save file or the journal is written
+        journal = savefile.file_stamp(self.__journal_name) if os.path.exists(self.__journal_name) else '-'
+        return savefile.file_stamp(self.__filename) + ' ' + journal
+
+    #reads the cache file, returns whether it matches the save file and the journal (else the totals are dropped)
+    def read(self):
+        self.__totals = {}
+        try:
+            with np.load(self.__cache_name) as data:
+                if str(data['stamp']) != self.stamp():
+                    return False
+                for period in analytics.PERIODS:
+                    self.__totals[period] = analytics.PeriodTotals.from_totals(period, data['first_key_{}'.format(period)],
+                                                                              data['totals_{}'.format(period)])
+        except (OSError, KeyError, ValueError):
+            self.__totals = {}
+            return False
+        return True
+
+    #makes the totals that are missing or do not cover the periods of store (eg. the last period was emptied),
+    #returns whether any were made, the transactions are grouped by day once for all of them (analytics.DailyTotals)
+    def fill(self, store, progress=None):
+        made = False
+        daily_totals = None
+        for period in analytics.PERIODS:
+            if len(store) == 0:
+                key_range = (0, -1)
+            else:
+                key_range = (analytics.period_key(store.get_date(0), period), analytics.period_key(store.get_date(-1), period))
+            if period not in self.__totals or self.__totals[period].get_key_range() != key_range:
+                if daily_totals == None:
+                    daily_totals = analytics.DailyTotals(store, progress)
+                self.__totals[period] = analytics.PeriodTotals(daily_totals, period)
+                made = True
+        return made
+
+    def write(self):
+        #the save file and the journal have to be written first (stamp)
+        arrays = {'stamp': np.array(self.stamp())}
+        for period, period_totals in self.__totals.items():
+            arrays['first_key_{}'.format(period)] = np.array(period_totals.get_first_key())
+            arrays['totals_{}'.format(period)] = period_totals.get_totals()
+        temp = self.__cache_name + '.tmp.npz'
+        try:
+            np.savez(temp, **arrays)
+            os.replace(temp, self.__cache_name)
+        except OSError:
+            #only a shortcut, eg. a read-only folder
+            pass
+
+    def get(self, period):
+        if period not in self.__totals:
+            return None
+        return self.__totals[period].copy()
+
+    def apply(self, t, sign):
+        #totals that cannot be changed (date outside their periods) are made again by fill
+        for period in list(self.__totals):
+            if self.__totals[period].apply(t, sign) == None:
+                del self.__totals[period]
+
+class SQLiteBackend:
+
+    #rows with the same date are kept in the order of their id
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            amount INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            type INTEGER NOT NULL CHECK (type BETWEEN 1 AND 5),
+            date TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date, id);
+        CREATE INDEX IF NOT EXISTS transactions_type ON transactions (type, date);
+        '''
+    #days since 1970-01-01 and months since January 1970 (the keys of analytics.period_keys)
+    DAYS = "CAST(julianday(date) - 2440587.5 AS INTEGER)"
+    MONTHS = "(CAST(strftime('%Y', date) AS INTEGER) * 12 + CAST(strftime('%m', date) AS INTEGER) - 23641)"
+    PERIOD_KEYS = {analytics.WEEK: '(({0} + 3) - ((({0} + 3) % 7) + 7) % 7) / 7'.format(DAYS),
+                   analytics.MONTH: MONTHS,
+                   analytics.QUARTER: '({0} - (({0} % 3) + 3) % 3) / 3'.format(MONTHS),
+                   analytics.YEAR: "(CAST(strftime('%Y', date) AS INTEGER) - 1970)",
+                   analytics.FORTNIGHT: '(({0} + 3) - ((({0} + 3) % 14) + 14) % 14) / 14'.format(DAYS),
+                   analytics.FISCAL_YEAR: '(({0} - {1}) - ((({0} - {1}) % 12) + 12) % 12) / 12'.format(
+                       MONTHS, analytics.FISCAL_YEAR_START - 1)}
+
+    def __init__(self, filename):
+        self.__filename = filename
+        #PACX loads in a worker thread and saves in the Tk thread, never at the same time
+        self.__connection = sqlite3.connect(filename, check_same_thread=False)
+        self.__connection.executescript(self.SCHEMA)
+        #changes not saved yet, ('add' or 'delete', transaction)
+        self.__pending = []
+
+    def get_filename(self):
+        return self.__filename
+
+    def close(self):
+        self.__connection.close()
+
+    #pickled without the connection (eg. returned by a process pool, see ledgers.py), it is opened again when unpickled
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_SQLiteBackend__connection']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__connection = sqlite3.connect(self.__filename, check_same_thread=False)
+
+    #progress(rows read) is called before each batch
+    def load(self, batch=65536, progress=None):
+        amounts, name_ids, types, dates = [], [], [], []
+        name_table = {}
+        cursor = self.__connection.execute('SELECT amount, name, type, date FROM transactions ORDER BY date, id')
+        while True:
+            if progress != None:
+                progress(sum(map(len, amounts)))
+            rows = cursor.fetchmany(batch)
+            if len(rows) == 0:
+                break
+            amount_list, names, type_list, date_list = zip(*rows)
+            for name in dict.fromkeys(names):
+                name_table.setdefault(name, len(name_table))
+            amounts.append(np.array(amount_list, dtype=np.int64))
+            name_ids.append(np.fromiter(map(name_table.__getitem__, names), np.int32, len(names)))
+            types.append(np.array(type_list, dtype=np.uint8))
+            dates.append(np.array(date_list, dtype='datetime64[D]'))
+        self.__pending = []
+        if len(amounts) == 0:
+            return transaction.TransactionStore()
+        return transaction.TransactionStore.from_columns(np.concatenate(amounts), np.concatenate(name_ids), list(name_table),
+                                                         np.concatenate(types), np.concatenate(dates))
+
+    def record_add(self, t):
+        self.__pending.append(('add', t))
+
+    def record_delete(self, t):
+        self.__pending.append(('delete', t))
+
+    def commit(self, store):
+        with self.__connection:
+            for action, t in self.__pending:
+                if action == 'add':
+                    self.__connection.execute('INSERT INTO transactions (amount, name, type, date) VALUES (?, ?, ?, ?)',
+                                              self.__row(t))
+                else:
+                    last = self.__connection.execute('SELECT id, amount, name, type, date FROM transactions '
+                                                     'ORDER BY date DESC, id DESC LIMIT 1').fetchone()
+                    if last == None or last[1:] != self.__row(t):
+                        raise IOError('Database does not match the deleted transaction: ' + str(t))
+                    self.__connection.execute('DELETE FROM transactions WHERE id = ?', (last[0],))
+        self.__pending = []
+
+    def save(self, store):
+        names = store.get_names()
+        rows = zip(store.get_amounts().tolist(), [names[i] for i in store.get_name_ids().tolist()],
+                   store.get_types().tolist(), np.datetime_as_string(store.get_dates()).tolist())
+        with self.__connection:
+            self.__connection.execute('DELETE FROM transactions')
+            self.__connection.executemany('INSERT INTO transactions (amount, name, type, date) VALUES (?, ?, ?, ?)', rows)
+        self.__pending = []
+
+    #the totals are grouped by SQLite when needed (period_totals)
+    def cached_period_totals(self, period):
+        return None
+
+    def period_totals(self, period):
+        #same result as analytics.period_totals, grouped by SQLite
+        key = self.PERIOD_KEYS[period]
+        rows = self.__connection.execute('SELECT {0} AS period_key, type, SUM(amount) FROM transactions '
+                                         'GROUP BY period_key, type'.format(key)).fetchall()
+        if len(rows) == 0:
+            return 0, np.zeros((0, len(analytics.TYPES)), dtype=np.int64)
+        rows = np.array(rows, dtype=np.int64)
+        first_key = int(rows[:, 0].min())
+        totals = np.zeros((int(rows[:, 0].max()) - first_key + 1, len(analytics.TYPES)), dtype=np.int64)
+        totals[rows[:, 0] - first_key, rows[:, 1] - 1] = rows[:, 2]
+        return first_key, totals
+
+    def __row(self, t):
+        return transaction.to_cents(t.get_amount()), t.get_name(), t.get_type(), str(t.get_date())
@@ -0,0 +1,146 @@
+'''
+Tests of the save file formats and their recovery paths (savefile, storage)
+
+Each test works on files in a temporary folder.
+usage: python -m pytest tests
+'''
+import os
+import sys
+import datetime as dt
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import transaction
+import savefile
+import storage
+import analytics
+
+ENTRIES = [(-6.9, 'breakfast', 2, dt.date(2017, 1, 5)), (1250.0, 'wages', 3, dt.date(2017, 1, 5)),
+           (-80.15, 'groceries', 1, dt.date(2017, 1, 9)), (-12.0, 'mic (sm58)', 4, dt.date(2017, 2, 1)),
+           (300.0, 'bonus', 5, dt.date(2017, 3, 30))]
+
+def make_store(entries=ENTRIES):
+    store = transaction.TransactionStore()
+    for amount, name, type_, date in entries:
+        store.insert_sorted(transaction.Transaction(amount, name, type_, date))
+    return store
+
+def rows(store):
+    return [str(t) for t in store]
+
+def test_journal_replay(tmp_path):
+    filename = str(tmp_path / 'journal.txt')
+    backend = storage.FileBackend(filename)
+    store = make_store()
+    backend.save(store)
+    t = transaction.Transaction(-4.5, 'coffee', 2, dt.date(2017, 4, 1))
+    store.insert_sorted(t)
+    backend.record_add(t)
+    backend.commit(store)
+    assert os.path.exists(filename + '.journal')
+    assert rows(storage.FileBackend(filename).load()) == rows(store)
+
+def test_stale_journal_is_ignored(tmp_path):
+    filename = str(tmp_path / 'stale.txt')
+    store = make_store()
+    storage.FileBackend(filename).save(store)
+    with open(filename + '.journal', 'w') as file:
+        file.write(savefile.JOURNAL_HEADER + ' 0 0\n')
+        file.write('a//1.0,,,old,,,3,,,2016-01-01\n')
+    assert rows(storage.FileBackend(filename, read_only=True).load()) == rows(store)
+    assert os.path.exists(filename + '.journal')
+    assert rows(storage.FileBackend(filename).load()) == rows(store)
+    assert not os.path.exists(filename + '.journal')
+
+def test_damaged_journal(tmp_path):
+    filename = str(tmp_path / 'damaged.txt')
+    backend = storage.FileBackend(filename)
+    store = make_store()
+    backend.save(store)
+    t = transaction.Transaction(-4.5, 'coffee', 2, dt.date(2017, 4, 1))
+    store.insert_sorted(t)
+    backend.record_add(t)
+    backend.commit(store)
+    #a record cut off by a crash while saving
+    with open(filename + '.journal', 'a') as file:
+        file.write('a//-1.0,,,half')
+    backend = storage.FileBackend(filename)
+    loaded = backend.load()
+    assert rows(loaded) == rows(store)
+    #the next commit writes the save file again
+    backend.commit(loaded)
+    assert not os.path.exists(filename + '.journal')
+    assert rows(savefile.load(filename)) == rows(store)
+
+def test_journal_delete_mismatch(tmp_path):
+    filename = str(tmp_path / 'mismatch.txt')
+    storage.FileBackend(filename).save(make_store())
+    with open(filename + '.journal', 'w') as file:
+        file.write(savefile.JOURNAL_HEADER + ' ' + savefile.file_stamp(filename) + '\n')
+        file.write('d//1.0,,,not the last one,,,3,,,2017-03-30\n')
+    with pytest.raises(IOError):
+        storage.FileBackend(filename).load()
+
+@pytest.mark.parametrize('date', ['', '2017-02', '2017'])
+def test_text_refuses_bad_dates(tmp_path, date):
+    filename = str(tmp_path / 'dates.txt')
+    with open(filename, 'w') as file:
+        file.write(savefile.HEADER + '\n' + 't//1.0,,,a,,,1,,,2017-01-01\n' + 't//2.0,,,b,,,2,,,{}\n'.format(date))
+    with pytest.raises(ValueError):
+        savefile.load(filename)
+
+def test_text_reads_unpadded_dates(tmp_path):
+    filename = str(tmp_path / 'unpadded.txt')
+    with open(filename, 'w') as file:
+        file.write(savefile.HEADER + '\n' + 't//1.0,,,a,,,1,,,2017-1-5\n')
+    assert savefile.load(filename).get_date(0) == dt.date(2017, 1, 5)
+
+def test_binary_round_trip(tmp_path):
+    filename = str(tmp_path / 'round trip.pacx')
+    store = make_store()
+    savefile.save(filename, store)
+    assert savefile.is_binary(filename)
+    assert rows(savefile.load(filename)) == rows(store)
+    #same as through the text format
+    savefile.convert(filename, str(tmp_path / 'round trip.txt'))
+    assert rows(savefile.load(str(tmp_path / 'round trip.txt'))) == rows(store)
+
+def test_binary_only_empty_names(tmp_path):
+    filename = str(tmp_path / 'empty names.pacx')
+    store = make_store([(1.0, '', 3, dt.date(2017, 1, 1)), (-2.0, '', 1, dt.date(2017, 1, 2))])
+    savefile.save(filename, store)
+    assert rows(savefile.load(filename)) == rows(store)
+
+def test_binary_padding_is_zero(tmp_path):
+    filename = str(tmp_path / 'padding.pacx')
+    store = make_store()
+    savefile.save(filename, store)
+    with open(filename, 'rb') as file:
+        file.seek(savefile.BINARY_OFFSET)
+        records = np.frombuffer(file.read(len(store) * savefile.RECORD.itemsize), dtype=np.uint8)
+    padding = records.reshape(len(store), savefile.RECORD.itemsize)[:, 21:]
+    assert not padding.any()
+
+def test_binary_compact_while_loaded(tmp_path):
+    #the loaded store maps the file, it is written again in place (save_atomic)
+    filename = str(tmp_path / 'compact.pacx')
+    savefile.save(filename, make_store())
+    store = savefile.load(filename)
+    store.insert_sorted(transaction.Transaction(-4.5, 'coffee', 2, dt.date(2017, 1, 6)))
+    savefile.save_atomic(filename, store)
+    assert rows(savefile.load(filename)) == rows(store)
+
+def test_sqlite_period_keys_before_1970(tmp_path):
+    #negative day and month numbers, the keys are rounded down as in analytics.period_keys
+    entries = [(float(n), 'entry', n % 5 + 1, dt.date(1968, 12, 20) + dt.timedelta(days=37 * n)) for n in range(40)]
+    store = make_store(entries)
+    backend = storage.SQLiteBackend(str(tmp_path / 'old.db'))
+    backend.save(store)
+    for period in analytics.PERIODS:
+        first_key, totals = backend.period_totals(period)
+        expected_key, expected = analytics.period_totals(store, period)
+        assert first_key == expected_key
+        assert np.array_equal(totals, expected)
+    backend.close()
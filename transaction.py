@@ -1,3 +1,5 @@
+import numpy as np
+
 class Transaction:
 
     #t_type is a number, date is datetime.date object
@@ -38,6 +40,236 @@ class Transaction:
     def set_date(self, date):
         self.__date = date
 
+#a row of a TransactionStore, with the same api as Transaction (nothing is copied)
+class TransactionView:
+
+    __slots__ = ('_TransactionView__store', '_TransactionView__index')
+
+    def __init__(self, store, index):
+        self.__store = store
+        self.__index = index
+
+    def __str__(self):
+        return self.get_name() + ': ' + str(self.get_amount()) + ' (' +\
+               type_to_text(self.get_type()) + ') ' + str(self.get_date())
+
+    def get_amount(self):
+        return self.__store.get_amount(self.__index)
+
+    def get_name(self):
+        return self.__store.get_name(self.__index)
+
+    def get_type(self):
+        return self.__store.get_type(self.__index)
+
+    def get_typestr(self):
+        return type_to_text(self.get_type())
+
+    def get_date(self):
+        return self.__store.get_date(self.__index)
+
+    def set_amount(self, amount):
+        self.__store.set_amount(self.__index, amount)
+
+    def set_name(self, name):
+        self.__store.set_name(self.__index, name)
+
+    def set_type(self, t_type):
+        self.__store.set_type(self.__index, t_type)
+
+    def set_date(self, date):
+        self.__store.set_date(self.__index, date)
+
+class TransactionStore:
+
+    #transactions kept as parallel numpy columns instead of one object per row
+    #amounts are int64 cents, types uint8, dates datetime64[D], names are ids into an interned name table
+    #ledgers is the index of the save file a row belongs to when several are open (see ledgers.py), else 0
+    def __init__(self, capacity=64):
+        self.__size = 0
+        self.__amounts = np.zeros(capacity, dtype=np.int64)
+        self.__types = np.zeros(capacity, dtype=np.uint8)
+        self.__dates = np.zeros(capacity, dtype='datetime64[D]')
+        self.__name_ids = np.zeros(capacity, dtype=np.int32)
+        self.__ledgers = np.zeros(capacity, dtype=np.int16)
+        self.__names = []
+        self.__name_table = {}
+
+    #build a store straight from columns (amounts in cents, name_ids index into names)
+    @classmethod
+    def from_columns(cls, amounts, name_ids, names, types, dates, ledgers=None):
+        store = cls(capacity=0)
+        store.__amounts = np.asarray(amounts, dtype=np.int64)
+        store.__types = np.asarray(types, dtype=np.uint8)
+        store.__dates = np.asarray(dates, dtype='datetime64[D]')
+        store.__name_ids = np.asarray(name_ids, dtype=np.int32)
+        store.__names = list(names)
+        store.__name_table = {name: i for i, name in enumerate(store.__names)}
+        store.__size = len(store.__amounts)
+        if ledgers is None:
+            store.__ledgers = np.zeros(store.__size, dtype=np.int16)
+        else:
+            store.__ledgers = np.asarray(ledgers, dtype=np.int16)
+        if not len(store.__types) == len(store.__dates) == len(store.__name_ids) == len(store.__ledgers) == store.__size:
+            raise ValueError('Columns have different lengths (from_columns)')
+        return store
+
+    def __len__(self):
+        return self.__size
+
+    def __getitem__(self, index):
+        return TransactionView(self, self.__check_index(index))
+
+    def __iter__(self):
+        for i in range(self.__size):
+            yield TransactionView(self, i)
+
+    #columns (views, only valid until the store is changed)
+    def get_amounts(self):
+        return self.__amounts[:self.__size]
+
+    def get_types(self):
+        return self.__types[:self.__size]
+
+    def get_dates(self):
+        return self.__dates[:self.__size]
+
+    def get_name_ids(self):
+        return self.__name_ids[:self.__size]
+
+    def get_names(self):
+        return self.__names
+
+    def get_ledgers(self):
+        return self.__ledgers[:self.__size]
+
+    #single values
+    def get_amount(self, index):
+        return int(self.__amounts[self.__check_index(index)]) / 100
+
+    def get_name(self, index):
+        return self.__names[self.__name_ids[self.__check_index(index)]]
+
+    def get_type(self, index):
+        return int(self.__types[self.__check_index(index)])
+
+    def get_date(self, index):
+        return self.__dates[self.__check_index(index)].item()
+
+    def get_ledger(self, index):
+        return int(self.__ledgers[self.__check_index(index)])
+
+    def set_amount(self, index, amount):
+        self.__amounts[self.__check_index(index)] = to_cents(amount)
+
+    def set_name(self, index, name):
+        self.__name_ids[self.__check_index(index)] = self.intern_name(name)
+
+    def set_type(self, index, t_type):
+        type_to_text(t_type)
+        self.__types[self.__check_index(index)] = t_type
+
+    def set_date(self, index, date):
+        self.__dates[self.__check_index(index)] = np.datetime64(date, 'D')
+
+    def intern_name(self, name):
+        if name not in self.__name_table:
+            self.__name_table[name] = len(self.__names)
+            self.__names.append(name)
+        return self.__name_table[name]
+
+    def append(self, t, ledger=0):
+        self.insert(self.__size, t, ledger)
+
+    #t is anything with the Transaction getters
+    def insert(self, index, t, ledger=0):
+        if index < 0:
+            index = max(self.__size + index, 0)
+        index = min(index, self.__size)
+        type_to_text(t.get_type())
+        if self.__size == len(self.__amounts):
+            self.__grow()
+        n = self.__size
+        for column in (self.__amounts, self.__types, self.__dates, self.__name_ids, self.__ledgers):
+            column[index + 1:n + 1] = column[index:n]
+        self.__ledgers[index] = ledger
+        self.__amounts[index] = to_cents(t.get_amount())
+        self.__types[index] = t.get_type()
+        self.__dates[index] = np.datetime64(t.get_date(), 'D')
+        self.__name_ids[index] = self.intern_name(t.get_name())
+        self.__size = n + 1
+
+    #inserts after the rows with the same or an earlier date (binary search), returns the index
+    def insert_sorted(self, t, ledger=0):
+        index = self.bisect(t.get_date())
+        self.insert(index, t, ledger)
+        return index
+
+    #index after the last row dated on or before date, the rows must be sorted by date
+    def bisect(self, date):
+        return int(np.searchsorted(self.get_dates(), np.datetime64(date, 'D'), side='right'))
+
+    #removes the row and returns it as an ordinary Transaction
+    def pop(self, index=-1):
+        index = self.__check_index(index)
+        t = Transaction(self.get_amount(index), self.get_name(index), self.get_type(index), self.get_date(index))
+        n = self.__size
+        for column in (self.__amounts, self.__types, self.__dates, self.__name_ids, self.__ledgers):
+            column[index:n - 1] = column[index + 1:n]
+        self.__size = n - 1
+        return t
+
+    #independent copy of the rows (eg. for a worker thread while this one keeps changing)
+    def copy(self):
+        return TransactionStore.from_columns(self.get_amounts().copy(), self.get_name_ids().copy(), self.get_names(),
+                                             self.get_types().copy(), self.get_dates().copy(), self.get_ledgers().copy())
+
+    #new store of the rows where mask is True (eg. store.get_ledgers() == 1), in the same order
+    def select(self, mask):
+        return TransactionStore.from_columns(self.get_amounts()[mask], self.get_name_ids()[mask], self.get_names(),
+                                             self.get_types()[mask], self.get_dates()[mask], self.get_ledgers()[mask])
+
+    #stable sort by date
+    def sort(self):
+        order = np.argsort(self.get_dates(), kind='stable')
+        self.__amounts = self.get_amounts()[order]
+        self.__types = self.get_types()[order]
+        self.__dates = self.get_dates()[order]
+        self.__name_ids = self.get_name_ids()[order]
+        self.__ledgers = self.get_ledgers()[order]
+
+    #copies the columns that are views of other memory (eg. the memory mapped binary save file) so the store no longer
+    #holds on to it
+    def own_columns(self):
+        for attr in ('_TransactionStore__amounts', '_TransactionStore__types',
+                     '_TransactionStore__dates', '_TransactionStore__name_ids', '_TransactionStore__ledgers'):
+            column = getattr(self, attr)
+            if column.base is not None:
+                setattr(self, attr, column.copy())
+
+    def __grow(self):
+        capacity = max(64, len(self.__amounts) * 2)
+        for attr in ('_TransactionStore__amounts', '_TransactionStore__types',
+                     '_TransactionStore__dates', '_TransactionStore__name_ids', '_TransactionStore__ledgers'):
+            old = getattr(self, attr)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.__size] = old[:self.__size]
+            setattr(self, attr, new)
+
+    def __check_index(self, index):
+        if index < 0:
+            index += self.__size
+        if not 0 <= index < self.__size:
+            raise IndexError('TransactionStore index out of range')
+        return index
+
+def to_cents(amount):
+    #ValueError for amounts that are not finite or do not fit the int64 columns (eg. 'nan', 'inf', 1e30)
+    amount = float(amount)
+    if not abs(amount) < 2 ** 63 / 100:
+        raise ValueError('Amount out of range (to_cents): ' + str(amount))
+    return int(round(amount * 100))
+
 def type_to_text(type_num):
     if isinstance(type_num, int):
         if type_num == 1:
@@ -0,0 +1,94 @@
+'''
+PACX background jobs
+
+Runs the slow jobs (loading a file, grouping the transactions into periods) in a thread, so the window stays
+responsive. The Tk thread collects progress and results with poll() (App calls it with after()), since tkinter
+must only be used from the Tk thread.
+'''
+import queue
+import threading
+
+class Cancelled(Exception):
+    pass
+
+
+class Worker:
+
+    #one thread, the jobs are run in order
+    #each job belongs to a channel (eg. 'load', 'analysis'), submitting a job cancels the older job of its channel
+    def __init__(self):
+        self.__jobs = queue.Queue()
+        self.__results = queue.Queue()
+        self.__lock = threading.Lock()
+        #{channel: generation of the newest job}, {channel: generation of the last finished job}
+        self.__generations = {}
+        self.__finished = {}
+        self.__thread = None
+
+    #function(progress, *args) runs in the worker thread, progress(text) reports how far it is and raises
+    #Cancelled when a newer job of the channel was submitted (so the job can stop early)
+    def submit(self, channel, function, *args):
+        with self.__lock:
+            generation = self.__generations.get(channel, 0) + 1
+            self.__generations[channel] = generation
+        self.__jobs.put((channel, generation, function, args))
+        if self.__thread == None:
+            self.__thread = threading.Thread(target=self.__run, name='PACX worker', daemon=True)
+            self.__thread.start()
+        return generation
+
+    def cancel(self, channel):
+        with self.__lock:
+            generation = self.__generations.get(channel, 0) + 1
+            self.__generations[channel] = generation
+            self.__finished[channel] = generation
+
+    def is_current(self, channel, generation):
+        with self.__lock:
+            return self.__generations.get(channel, 0) == generation
+
+    #whether the newest job of the channel has not given its result yet
+    def is_pending(self, channel):
+        with self.__lock:
+            return self.__finished.get(channel, 0) != self.__generations.get(channel, 0)
+
+    def has_pending(self):
+        with self.__lock:
+            return any([self.__finished.get(c, 0) != g for c, g in self.__generations.items()])
+
+    #[(channel, kind, value)] since the last poll, kind is 'progress' (text), 'done' (result) or 'error' (exception)
+    #results of cancelled jobs are left out
+    def poll(self):
+        results = []
+        while True:
+            try:
+                channel, generation, kind, value = self.__results.get_nowait()
+            except queue.Empty:
+                break
+            with self.__lock:
+                if self.__generations.get(channel, 0) != generation:
+                    continue
+                if kind != 'progress':
+                    self.__finished[channel] = generation
+            results.append((channel, kind, value))
+        return results
+
+    def __run(self):
+        while True:
+            channel, generation, function, args = self.__jobs.get()
+            if not self.is_current(channel, generation):
+                continue
+
+            def progress(text):
+                if not self.is_current(channel, generation):
+                    raise Cancelled()
+                self.__results.put((channel, generation, 'progress', text))
+
+            try:
+                result = function(progress, *args)
+            except Cancelled:
+                continue
+            except Exception as error:
+                self.__results.put((channel, generation, 'error', error))
+            else:
+                self.__results.put((channel, generation, 'done', result))